@@ -20,18 +20,40 @@ Command-Line Arguments:
 - `-f, --file`: Output the tree to a file.
 - `-vt <int>`: Set the vertical tabulation (indentation) in spaces.
 - `-ht <int>`: Set the horizontal tabulation (indentation) in spaces.
-- `-e <regex>`: Exclude files and directories matching the given regular expression.
+- `-e <regex>`: Exclude files and directories whose name contains a match of the given regular expression.
+- `-g <glob>`: Exclude files and directories whose whole name matches the given glob pattern (can be repeated).
 - `-d`: Exclude files, showing only directories.
+- `-L <int>, --max-depth <int>`: Show only the given number of levels, deeper directories are not scanned.
+- `--max-entries <int>`: Stop scanning after the given number of elements.
+- `-j <int>`: Scan directories with the given number of threads, the output stays the same.
+- `--save <path>`: Save the scanned tree as a binary snapshot.
+- `--load <path>`: Render a tree from a snapshot instead of scanning (scanning options are ignored).
+
+Classes:
+- `TreeStore`: Compact tree in parallel arrays with interned names, saved to and memory-mapped from binary snapshots.
+- `TreeNode`: View of one element of a `TreeStore`.
 
 Functions:
 - `process_arguments(arg: list[str]) -> dict`: Processes the command-line arguments and returns a dictionary with the selected options.
-- `get_directory_structure(path: str, includeFiles: bool, exclude_pattern: re.Pattern) -> tuple[dict, int]`: Recursively retrieves the directory structure.
-- `tree_string(tree: dict, tab: int = 4, horizontal_tab: int = 0) -> str`: Converts the directory structure to a visual tree string.
+- `scan_tree_store(path: str, includeFiles: bool, exclude_pattern: NameMatcher, max_depth: int, max_entries: int, threads: int) -> TreeStore`: Scans the directory structure with the shared `fs_walker`.
+- `get_directory_structure(...) -> tuple[dict, int]`: Same as `scan_tree_store`, returning a nested dictionary.
+- `tree_lines(tree: TreeStore | dict, tab: int = 4, horizontal_tab: int = 0, include_files: bool = True)`: Yields lines of the visual tree one at a time.
+- `tree_string(tree: TreeStore | dict, tab: int = 4, horizontal_tab: int = 0, include_files: bool = True) -> str`: Converts the directory structure to a visual tree string.
 
 """
 import os
 import re
 import sys
+import mmap
+import struct
+from array import array
+
+try:
+    from ..fs_walker.fs_walker import make_matcher, walk
+except ImportError:
+    # Run as a script, the walker is found next to this script's folder
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from fs_walker.fs_walker import make_matcher, walk
 
 # Symbols used to visualize the tree
 horizontal: str = "\u002D"  # -
@@ -51,11 +73,17 @@ def process_arguments(arg: list[str]) -> dict:
         - `-f` or `--file`: Outputs the result to a file.
         - `-vt <int>`: Sets the number of spaces to use as vertical tabs for indentation.
         - `-ht <int>`: Sets the number of spaces to use as horizontal tabs for indentation.
-        - `-e <str>`: Specifies files and directories that match regular expression to be exclude from the directory listing.
+        - `-e <str>`: Specifies files and directories that contain a match of regular expression to be exclude from the directory listing.
+        - `-g <str>`: Specifies files and directories whose whole name matches glob pattern to be exclude from the directory listing (can be repeated).
         - `-d`: Excludes files from a tree limiting it to directories.
+        - `-L <int>` or `--max-depth <int>`: Limits the tree to the specified number of levels, deeper directories are not scanned.
+        - `--max-entries <int>`: Stops scanning after the specified number of elements.
+        - `-j <int>`: Sets the number of threads scanning sibling directories at the same time.
+        - `--save <str>`: Saves the scanned tree to a binary snapshot file.
+        - `--load <str>`: Loads the tree from a snapshot file instead of scanning the directory.
 
     Returns:
-    - dict: A dictionary containing parsed options and values. ({"directory": str, "output2file": bool, "vertical_tab": int, "horizontal_tab": int, "excluded": str, "no_files": bool})
+    - dict: A dictionary containing parsed options and values. ({"directory": str, "output2file": bool, "vertical_tab": int, "horizontal_tab": int, "excluded": NameMatcher, "no_files": bool, "max_depth": int, "max_entries": int, "threads": int, "save": str, "load": str})
 
     Exits:
     - Displays help and exits if `-h` is specified.
@@ -67,9 +95,16 @@ def process_arguments(arg: list[str]) -> dict:
         "vertical_tab": 4,
         "horizontal_tab": 0,
         "excluded": None,
-        "no_files": False
+        "no_files": False,
+        "max_depth": None,
+        "max_entries": None,
+        "threads": 1,
+        "save": None,
+        "load": None
     }
     levels_up: int = 0
+    excluded_regex: str = None
+    excluded_globs: list[str] = []
 
     # Display help and exit if `-h` or `--help` is provided
     if "-h" in arg or "--help" in arg:
@@ -81,8 +116,15 @@ def process_arguments(arg: list[str]) -> dict:
               "  -f, --file               Output tree to a file\n"
               "  -vt <int>                Set vertical tab size (number of spaces for indentation)\n"
               "  -ht <int>                Set horizontal tab size (number of spaces for indentation)\n"
-              "  -e <str>                 Exclude files and directories that mach <str> regular expresion from the directory listing\n"
-              "  -d                       Excludes files from a tree limiting it to directories")
+              "  -e <str>                 Exclude files and directories that contain a mach of <str> regular expresion from the directory listing\n"
+              "  -g <str>                 Exclude files and directories whose whole name maches <str> glob pattern (can be repeated)\n"
+              "  -d                       Excludes files from a tree limiting it to directories\n"
+              "  -L <int>, --max-depth <int>\n"
+              "                           Show only <int> levels of the tree, deeper directories are not scanned\n"
+              "  --max-entries <int>      Stop scanning after <int> elements\n"
+              "  -j <int>                 Scan directories with <int> threads (output does not change)\n"
+              "  --save <str>             Save the scanned tree to <str> snapshot file\n"
+              "  --load <str>             Render the tree from <str> snapshot file instead of scanning")
         sys.exit()
 
     # Parse arguments
@@ -128,126 +170,399 @@ def process_arguments(arg: list[str]) -> dict:
         elif arg[i] == "-e":
             # Handle `-e` flag for exclusion regex
             if i + 1 < len(arg):
-                try:
-                    options["excluded"] = re.compile(arg[i + 1])
-                    i += 2
-                except re.error as e:
-                    sys.exit(f"Error: Invalid regular expression provided for exclusion: {e}")
+                excluded_regex = arg[i + 1]
+                i += 2
             else:
                 sys.exit("Error: The '-e' flag must be followed by a regular expression with no spaces.")
 
+        elif arg[i] == "-g":
+            # Handle `-g` flag for exclusion glob
+            if i + 1 < len(arg):
+                excluded_globs.append(arg[i + 1])
+                i += 2
+            else:
+                sys.exit("Error: The '-g' flag must be followed by a glob pattern.")
+
         elif arg[i] == "-d":
             options["no_files"] = True
             i += 1
 
+        elif arg[i] in ("-L", "--max-depth"):
+            # Handle `-L` or `--max-depth` flag with a positive integer
+            if i + 1 < len(arg) and arg[i + 1].isdigit() and int(arg[i + 1]) > 0:
+                options["max_depth"] = int(arg[i + 1])
+                i += 2
+            else:
+                sys.exit("Error: The '-L' or '--max-depth' flag must be followed by a positive integer.")
+
+        elif arg[i] == "--max-entries":
+            # Handle `--max-entries` flag with an integer
+            if i + 1 < len(arg) and arg[i + 1].isdigit():
+                options["max_entries"] = int(arg[i + 1])
+                i += 2
+            else:
+                sys.exit("Error: The '--max-entries' flag must be followed by an integer.")
+
+        elif arg[i] == "-j":
+            # Handle `-j` flag with a positive integer
+            if i + 1 < len(arg) and arg[i + 1].isdigit() and int(arg[i + 1]) > 0:
+                options["threads"] = int(arg[i + 1])
+                i += 2
+            else:
+                sys.exit("Error: The '-j' flag must be followed by a positive integer.")
+
+        elif arg[i] == "--save":
+            # Handle `--save` flag with a path
+            if i + 1 < len(arg):
+                options["save"] = arg[i + 1]
+                i += 2
+            else:
+                sys.exit("Error: The '--save' flag must be followed by a path.")
+
+        elif arg[i] == "--load":
+            # Handle `--load` flag with a path to an existing file
+            if i + 1 < len(arg) and os.path.isfile(arg[i + 1]):
+                options["load"] = arg[i + 1]
+                i += 2
+            else:
+                sys.exit("Error: The '--load' flag must be followed by a path to a snapshot file.")
+
         else:
             # Invalid or unsupported argument
             sys.exit(f"Error: Invalid argument '{arg[i]}'")
 
+    # Compile exclusions into one matcher
+    try:
+        options["excluded"] = make_matcher(excluded_regex, excluded_globs)
+    except re.error as e:
+        sys.exit(f"Error: Invalid regular expression provided for exclusion: {e}")
+
     # Adjust directory
     for _ in range(levels_up): 
         options["directory"] = os.path.dirname(options["directory"])
 
     return options
 
-def get_directory_structure(path: str, includeFiles: bool, exclude_pattern: re.Pattern) -> tuple[dict, int]:
+class TreeNode:
     """
-    Recursively generates a dictionary representing the directory structure.
-    
+    A light view of one element of a `TreeStore`, created on demand and holding only its index.
+    """
+    __slots__ = ("store", "index")
+
+    def __init__(self, store: "TreeStore", index: int):
+        self.store = store
+        self.index = index
+
+    @property
+    def name(self) -> str:
+        return self.store.name(self.index)
+
+    @property
+    def is_dir(self) -> bool:
+        return bool(self.store.kind[self.index])
+
+    @property
+    def parent(self) -> "TreeNode":
+        parent: int = self.store.parent[self.index]
+        return TreeNode(self.store, parent) if parent >= 0 else None
+
+    @property
+    def children(self) -> list:
+        return [TreeNode(self.store, child) for child in self.store.children(self.index)]
+
+    def __repr__(self) -> str:
+        return f"TreeNode({self.name!r}{'/' if self.is_dir else ''})"
+
+class TreeStore:
+    """
+    A compact directory tree kept in parallel arrays indexed by element.
+
+    Element 0 is the root. Every element has the index of its parent, the ID of its interned name
+    and its kind (1 directory, 0 file), 17 bytes in total. Children of a directory are stored
+    next to each other, so a directory keeps only the index of its first child and the number
+    of children. Each name is stored once no matter how many elements carry it.
+
+    While a tree is built names are interned in a dictionary, `compact` then packs them into
+    one UTF-8 buffer with offsets and the store becomes read-only. A store can be saved as
+    a binary snapshot and loaded back by memory-mapping the file, the arrays are then views
+    of the file and names are decoded only when rendered.
+    """
+    # Snapshot: header, name offsets, 4-byte arrays, kinds, UTF-8 names (native byte order)
+    SNAPSHOT_MAGIC: bytes = b"DTREE001"
+    SNAPSHOT_HEADER: struct.Struct = struct.Struct("8sQQQ")  # magic, elements, names, bytes of names
+
+    def __init__(self, root_name: str):
+        self.parent = array('i')       # Index of parent, -1 for the root
+        self.name_id = array('I')      # ID of interned name
+        self.kind = array('B')         # 1 directory, 0 file
+        self.first_child = array('I')  # Index of first child
+        self.child_count = array('I')  # Number of children
+        self._names: list = []         # Interned names while building
+        self._name_ids: dict = {}
+        self._name_offsets = None      # Offsets of names in the packed buffer
+        self._name_bytes = None
+        self.append(-1, root_name, True)
+
+    def __len__(self) -> int:
+        return len(self.parent)
+
+    def __getitem__(self, index: int) -> TreeNode:
+        return TreeNode(self, index)
+
+    def append(self, parent: int, name: str, is_dir: bool) -> int:
+        """Adds an element and returns its index, children of one directory must be appended one after another."""
+        if self._name_ids is None:
+            raise TypeError("compacted or loaded TreeStore is read-only")
+        name_id: int = self._name_ids.get(name)
+        if name_id is None:
+            name_id = self._name_ids[name] = len(self._names)
+            self._names.append(name)
+        index: int = len(self.parent)
+        self.parent.append(parent)
+        self.name_id.append(name_id)
+        self.kind.append(1 if is_dir else 0)
+        self.first_child.append(0)
+        self.child_count.append(0)
+        if parent >= 0:
+            if not self.child_count[parent]:
+                self.first_child[parent] = index
+            self.child_count[parent] += 1
+        return index
+
+    def name(self, index: int) -> str:
+        """Returns name of an element."""
+        return self.name_of_id(self.name_id[index])
+
+    def name_of_id(self, name_id: int) -> str:
+        """Returns an interned name, names of a loaded snapshot are decoded from the mapped file."""
+        if self._name_bytes is None:
+            return self._names[name_id]
+        return str(self._name_bytes[self._name_offsets[name_id]:self._name_offsets[name_id + 1]], "utf-8", "surrogateescape")
+
+    def name_count(self) -> int:
+        """Returns the number of distinct names."""
+        return len(self._name_offsets) - 1 if self._name_bytes is not None else len(self._names)
+
+    def children(self, index: int, include_files: bool = True) -> range:
+        """Returns indexes of children of an element (only directories if `include_files` is False)."""
+        first: int = self.first_child[index]
+        children = range(first, first + self.child_count[index])
+        return children if include_files else [child for child in children if self.kind[child]]
+
+    @classmethod
+    def from_dict(cls, tree: dict) -> "TreeStore":
+        """Builds a store from a nested dictionary with one root key (None value represents a file)."""
+        head: str = next(iter(tree))
+        store = cls(head)
+        stack: list = [(tree[head], 0)]
+        while stack:
+            dir_tree, index = stack.pop()
+            for element, subtree in dir_tree.items():
+                child: int = store.append(index, element, subtree is not None)
+                if subtree: stack.append((subtree, child))
+        return store.compact()
+
+    def to_dict(self) -> dict:
+        """Returns the tree as a nested dictionary (None value represents a file)."""
+        trees: list = [{} if self.kind[index] else None for index in range(len(self))]
+        for index in range(1, len(self)):
+            trees[self.parent[index]][self.name(index)] = trees[index]
+        return {self.name(0): trees[0]}
+
+    def compact(self) -> "TreeStore":
+        """Packs interned names into one UTF-8 buffer, dropping a string object and a dictionary entry per name."""
+        if self._name_bytes is None:
+            names: list = [name.encode("utf-8", "surrogateescape") for name in self._names]
+            self._name_offsets = array('Q', [0])
+            for name in names:
+                self._name_offsets.append(self._name_offsets[-1] + len(name))
+            self._name_bytes = b''.join(names)
+            self._names, self._name_ids = None, None
+        return self
+
+    def save(self, path: str):
+        """Writes the store to a binary snapshot file."""
+        self.compact()
+        with open(path, 'wb') as file:
+            file.write(self.SNAPSHOT_HEADER.pack(self.SNAPSHOT_MAGIC, len(self), self.name_count(), len(self._name_bytes)))
+            for part in (self._name_offsets, self.parent, self.first_child, self.name_id, self.child_count, self.kind):
+                file.write(part)
+            file.write(self._name_bytes)
+
+    @classmethod
+    def load(cls, path: str) -> "TreeStore":
+        """Memory-maps a snapshot file written by `save`, nothing is copied until it is used."""
+        with open(path, 'rb') as file:
+            data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(data)
+        if len(data) < cls.SNAPSHOT_HEADER.size or view[:len(cls.SNAPSHOT_MAGIC)] != cls.SNAPSHOT_MAGIC:
+            raise ValueError(f"{path} is not a directory tree snapshot")
+        _, count, name_count, name_size = cls.SNAPSHOT_HEADER.unpack_from(view)
+
+        # Sections must fill the file exactly, a truncated snapshot would fail later in `cast`
+        size: int = cls.SNAPSHOT_HEADER.size + (name_count + 1) * array('Q').itemsize + name_size + \
+            count * (array('i').itemsize + 3 * array('I').itemsize + array('B').itemsize)
+        if len(data) != size:
+            raise ValueError(f"{path} is truncated or damaged ({len(data)} bytes, header implies {size})")
+
+        offset: int = cls.SNAPSHOT_HEADER.size
+        def take(code: str, length: int) -> memoryview:
+            nonlocal offset
+            size: int = length * array(code).itemsize
+            part = view[offset:offset + size].cast(code)
+            offset += size
+            return part
+
+        store = cls.__new__(cls)
+        store._name_offsets = take('Q', name_count + 1)
+        store.parent, store.first_child = take('i', count), take('I', count)
+        store.name_id, store.child_count, store.kind = take('I', count), take('I', count), take('B', count)
+        store._name_bytes = view[offset:offset + name_size]
+        store._names, store._name_ids = None, None
+        return store
+
+def scan_tree_store(path: str, includeFiles: bool, exclude_pattern, max_depth: int = None, max_entries: int = None, threads: int = 1) -> TreeStore:
+    """
+    Scans the directory structure into a compact `TreeStore`.
+
+    The tree is walked with the shared `fs_walker` (`os.scandir` with an explicit stack),
+    so each entry is classified by its directory listing and excluded directories are never entered.
+    Elements keep the order of the directory listing. Directories that can not be listed are shown empty.
+    Directories below `max_depth` levels are not listed at all, and the walk stops as soon as
+    `max_entries` elements are found. With more `threads` sibling directories are listed
+    at the same time, the walker still returns them in serial order, so the result does not change.
+
     Parameters:
     - path (str): The root directory path to scan.
     - includeFiles (bool): Whether to include files or just directories.
-    - exclude_pattern (re.Pattern): Regular expression that excludes matched files and directories if mached.
+    - exclude_pattern (NameMatcher | re.Pattern): Pattern that excludes matched files and directories.
+    - max_depth (int): Number of levels shown, elements of `path` are level 1 (None: no limit).
+    - max_entries (int): Maximal number of elements (None: no limit).
+    - threads (int): Number of threads listing directories. Default is 1.
+
+    Returns:
+    - TreeStore: The scanned tree, its root is named after the last part of `path`.
+    """
+    store = TreeStore(os.path.basename(path))
+    pending: dict = {path: 0}  # Index of directories found but not listed yet
+
+    # Symbolic links to directories are followed, links back to the current branch are skipped
+    # With files, `entries` holds subdirectories and files in listing order
+    walker = walk(path, exclude=exclude_pattern, max_depth=max_depth, follow_symlinks=True, threads=threads, ordered=includeFiles)
+    for dirpath, _, dirs, entries in walker:
+        if not includeFiles: entries = dirs
+
+        # Stop descending once the cap is reached, keeping only the elements that fit
+        if max_entries is not None and len(store) - 1 + len(entries) >= max_entries:
+            entries = entries[:max_entries - len(store) + 1]
+            walker.close()
+
+        index: int = pending.pop(dirpath)
+        directories: set = set(dirs)  # Entries of `dirs` are the same objects as in `entries`
+        for entry in entries:
+            if entry in directories:
+                pending[entry.path] = store.append(index, entry.name, True)
+            else:
+                store.append(index, entry.name, False)
+
+    return store.compact()
+
+def get_directory_structure(path: str, includeFiles: bool, exclude_pattern, max_depth: int = None, max_entries: int = None, threads: int = 1) -> tuple[dict, int]:
+    """
+    Generates a dictionary representing the directory structure.
+
+    The tree is scanned by `scan_tree_store` and converted, large trees are better kept in the store.
+    
+    Parameters:
+    - path, includeFiles, exclude_pattern, max_depth, max_entries, threads: As in `scan_tree_store`.
 
     Returns:
     - tuple containing:
         - dict: A nested dictionary representing the directory structure. (None value represents a file)
         - int: An element counter.
     """
-    # Recursive function to traverse the directory tree
-    def build_tree(current_path: str) -> tuple[dict, int]:
-        # Initial tree
-        dir_tree: dict = {}
-        element_counter: int = 1
-
-        # Iterate over elements in directory
-        for element in os.listdir(current_path):
-            if not (exclude_pattern and re.match(exclude_pattern, element)):
-                element_path = os.path.join(current_path, element)
-
-                # Encountered directory, recurse deeper
-                if os.path.isdir(element_path):
-                    dir_tree[element], temp_counter = build_tree(os.path.join(current_path, element))
-                    element_counter += temp_counter
-
-                # Encountered file, mark with None
-                elif includeFiles and os.path.isfile(element_path):
-                    dir_tree[element] = None
-                    element_counter += 1
-        
-        return dir_tree, element_counter
-    
-    tree, counter = build_tree(path)
-    return {os.path.basename(path) : tree}, counter - 1 
+    store: TreeStore = scan_tree_store(path, includeFiles, exclude_pattern, max_depth, max_entries, threads)
+    return store.to_dict(), len(store) - 1
 
-def tree_string(tree: dict, tab: int = 4, horizontal_tab: int = 0) -> str:
+def tree_lines(tree, tab: int = 4, horizontal_tab: int = 0, include_files: bool = True):
     """
-    Generates a visual representation of a directory structure.
+    Yields lines of a visual representation of a directory structure while walking it.
 
-    This function takes a nested dictionary representing a directory structure
-    and returns a formatted string that visually represents the structure
-    as a tree, using symbols to indicate branching. Files are represented
-    as leaf nodes, and directories are shown with branches connecting their
-    contents. Each level of the tree is indented based on the specified tab size.
+    Lines are produced one at a time (each ending with a newline) from an explicit stack,
+    so the picture is never held in memory and deep trees do not hit the recursion limit.
+    Each line can be printed or written as soon as it is yielded.
 
     Arguments:
-    - tree (dict): A nested dictionary where each key represents a directory or file.
+    - tree (TreeStore | dict): The tree, a dictionary is converted with `TreeStore.from_dict`.
+                   In a nested dictionary each key represents a directory or file.
                    Directories are represented as keys with dictionary values,
                    while files are represented as keys with `None` values.
     - tab (int): The number of characters used for indentation at each level. Default is 4.
     - horizontal_tab (int): The number of lines that separate each branch. Default is 0.
+    - include_files (bool): Whether files are shown. Default is True.
 
-    Returns:
-    - str: A string containing the visual representation of the directory tree.
+    Yields:
+    - str: Consecutive lines of the visual representation of the directory tree.
     """
-    # Recursive function to build tree string
-    def build_string(tree: dict, prefix: str = '', depth: bool = False) -> str:
-        # initial string
-        tree_str: str = ''
+    store: TreeStore = tree if isinstance(tree, TreeStore) else TreeStore.from_dict(tree)
+    yield store.name(0) + '\n'
 
-        # iterate over elements in current directory 
-        for index, element in enumerate(tree, 1):
+    branch: str = horizontal * (tab-1)
+    kind = store.kind
+    # Stack of (numbered children of a directory, number of children, prefix of their rows)
+    children = store.children(0, include_files)
+    stack: list = [(enumerate(children, 1), len(children), '')]
+    while stack:
+        elements, size, prefix = stack[-1]
+
+        # iterate over elements in current directory until a subdirectory is entered
+        for index, element in elements:
 
             # Check if it's the last element
-            isLast: bool = index == len(tree)
+            isLast: bool = index == size
             edge: str = corner if isLast else verBranch
-            
+
             # Insert horizontal tabulation
             for _ in range(horizontal_tab):
-                tree_str += prefix + '|' + '\n'
+                yield prefix + '|' + '\n'
 
-            tree_str += f"{prefix}{edge}{horizontal * (tab-1)} {element}"
+            # If it's a directory, continue with its sub branch
+            if kind[element]:
+                yield f"{prefix}{edge}{branch} {store.name(element)}/\n"
+                children = store.children(element, include_files)
+                if children:
+                    stack.append((enumerate(children, 1), len(children), prefix + (' ' if isLast else vertical) + ' ' * tab))
+                    break
 
-            # If it's a directory
-            if tree[element] is not None:               
-                # Finnish row
-                tree_str += "/\n"
+            # If it's a file
+            else: yield f"{prefix}{edge}{branch} {store.name(element)}\n"
 
-                # Update prefix for deeper branch
-                deeper_prefix = prefix     
-                if tree[element]:
-                    deeper_prefix += (' ' if isLast else vertical) + ' ' * tab
+        # Directory finished
+        else: stack.pop()
 
-                # Add sub branch
-                tree_str += build_string(tree[element], deeper_prefix, True)
+def tree_string(tree, tab: int = 4, horizontal_tab: int = 0, include_files: bool = True) -> str:
+    """
+    Generates a visual representation of a directory structure.
 
-            # If it's a file
-            else: tree_str += '\n'
+    This function takes a nested dictionary representing a directory structure
+    and returns a formatted string that visually represents the structure
+    as a tree, using symbols to indicate branching. Files are represented
+    as leaf nodes, and directories are shown with branches connecting their
+    contents. Each level of the tree is indented based on the specified tab size.
+    The string is joined once from lines of `tree_lines`.
 
-        return tree_str
-    
-    head: str = list(tree.keys())[0]
-    return head + '\n' + build_string(tree[head])
+    Arguments:
+    - tree (TreeStore | dict): A `TreeStore` or a nested dictionary where each key represents a directory or file.
+                   Directories are represented as keys with dictionary values,
+                   while files are represented as keys with `None` values.
+    - tab (int): The number of characters used for indentation at each level. Default is 4.
+    - horizontal_tab (int): The number of lines that separate each branch. Default is 0.
+    - include_files (bool): Whether files are shown. Default is True.
+
+    Returns:
+    - str: A string containing the visual representation of the directory tree.
+    """
+    return ''.join(tree_lines(tree, tab, horizontal_tab, include_files))
 
 if __name__ == "__main__":
     options = process_arguments(sys.argv)
@@ -257,27 +572,46 @@ if __name__ == "__main__":
     print("Output to:\t\t", "file" if options["output2file"] else "console")
     print("Vertical tabulation:\t", options["vertical_tab"], "characters")
     print("Horizontal tabulation:\t", options["horizontal_tab"], "characters")
-    print("Exclude names matching:\t", options["excluded"])
+    print("Exclude names matching:\t", options["excluded"].pattern if options["excluded"] else None)
     print("Exclude files:\t\t", options["no_files"])
+    print("Maximal depth:\t\t", options["max_depth"])
+    print("Maximal elements:\t", options["max_entries"])
+    print("Scanning threads:\t", options["threads"])
     
-    print("\nScanning directory tree...", end="\r")
-    tree, counter = get_directory_structure(options["directory"], 
-                                            not options["no_files"], 
-                                            options["excluded"])
-    print(f"Directory scanned, {counter} elements found.\n")
-
-    tree = tree_string(tree, options["vertical_tab"], options["horizontal_tab"])
+    if options["load"]:
+        try:
+            tree = TreeStore.load(options["load"])
+        except (OSError, ValueError) as e:
+            sys.exit(f"Error: Snapshot can not be loaded: {e}")
+        print(f"\nSnapshot loaded, {len(tree) - 1} elements found.\n")
+    else:
+        print("\nScanning directory tree...", end="\r")
+        # Files are kept in a saved snapshot even if not shown now
+        tree = scan_tree_store(options["directory"], 
+                               not options["no_files"] or options["save"] is not None, 
+                               options["excluded"],
+                               options["max_depth"],
+                               options["max_entries"],
+                               options["threads"])
+        print(f"Directory scanned, {len(tree) - 1} elements found.\n")
+        if options["save"]:
+            tree.save(options["save"])
+            print("Snapshot saved to", options["save"], "\n")
+
+    # Lines are written while the tree is rendered
+    lines = tree_lines(tree, options["vertical_tab"], options["horizontal_tab"], not options["no_files"])
 
     if options["output2file"]:
-        fileName:str = os.path.basename(options["directory"]) + "_directory_tree.txt"
+        fileName:str = tree.name(0) + "_directory_tree.txt"
         counter = 1
         while os.path.exists(fileName):
-            fileName = f"""{os.path.basename(options["directory"])}_directory_tree({counter}).txt"""
+            fileName = f"""{tree.name(0)}_directory_tree({counter}).txt"""
             counter += 1
 
-        with open(fileName, 'w', encoding="utf-8") as file:
-            file.write(tree)
+        with open(fileName, 'w', encoding="utf-8", buffering=1 << 20) as file:
+            file.writelines(lines)
         
         print("Directory tree saved to", fileName)
     else:
-        print(tree)
+        sys.stdout.writelines(lines)
+        print()
@@ -0,0 +1,95 @@
+import sys
+import time
+import random
+
+from file_diff import create_diff, ALGORITHMS
+
+# Benchmark of diff engines against difflib.Differ on synthetic files.
+# Two workloads are measured: unique lines (log-like, settled mostly by dropping unmatched lines and
+# stripping common ends, so the engines hardly work) and few distinct lines repeated over and over
+# (code-like, where the engines really search and differ in speed and in the size of the edit script).
+#
+# USAGE: python benchmark.py [lines ...] [-r lines] [-d distinct] [-c change_rate] [-l differ_limit] [-L differ_limit]
+#   lines         Sizes of generated files with unique lines (default: 100000 1000000 10000000)
+#   -r <int>      Size of generated files with repeated lines, can be repeated (default: 500 20000)
+#   -d <int>      Number of distinct lines in files with repeated lines (default: 16)
+#   -c <float>    Fraction of lines changed, inserted or deleted (default: 0.01)
+#   -l <int>      Largest file with unique lines still diffed with difflib.Differ, it is too slow above that (default: 100000)
+#   -L <int>      Largest file with repeated lines still diffed with difflib.Differ (default: 500)
+#   'edit script' is the number of removed and added lines, the smaller the better the difference.
+
+def generate_files(lines, change_rate, seed=0):
+     '''Create two lists of unique lines where the second one is a randomly edited copy of the first one'''
+     rng = random.Random(seed)
+     list1 = ["log entry {} value {}\n".format(i, rng.randrange(1000)) for i in range(lines)]
+     list2 = []
+     for line in list1:
+          roll = rng.random()
+          if roll < change_rate / 3: continue                           # deleted
+          elif roll < change_rate * 2 / 3: list2.append("changed " + line) # changed
+          elif roll < change_rate: list2.extend((line, "inserted\n"))    # inserted
+          else: list2.append(line)
+     return list1, list2
+
+def generate_repeated_files(lines, change_rate, distinct=16, seed=0):
+     '''Create two lists drawn from few distinct lines where the second one is a randomly edited copy of the first one'''
+     rng = random.Random(seed)
+     vocabulary = ["     statement {}\n".format(k) for k in range(distinct)]
+     list1 = [rng.choice(vocabulary) for _ in range(lines)]
+     list2 = []
+     for line in list1:
+          roll = rng.random()
+          if roll < change_rate / 3: continue                                        # deleted
+          elif roll < change_rate * 2 / 3: list2.append(rng.choice(vocabulary))       # changed
+          elif roll < change_rate: list2.extend((line, rng.choice(vocabulary)))       # inserted
+          else: list2.append(line)
+     return list1, list2
+
+def check_diff(difference, list1, list2):
+     '''Confirm that the difference rebuilds both lists'''
+     rebuilt1 = [line[2:] for line in difference if line[:2] in ('  ', '- ')]
+     rebuilt2 = [line[2:] for line in difference if line[:2] in ('  ', '+ ')]
+     return rebuilt1 == list1 and rebuilt2 == list2
+
+def benchmark(workloads, change_rate):
+     '''Diff every workload of (name, generator, sizes, differ_limit) with every algorithm'''
+     print("{:>10} | {:>10} | {:>10} | {:>10} | {:>11} | {}".format("workload", "lines", "algorithm", "time [s]", "edit script", "valid"))
+     for name, generator, sizes, differ_limit in workloads:
+          for lines in sizes:
+               list1, list2 = generator(lines, change_rate)
+               for algorithm in ALGORITHMS:
+                    if algorithm == "differ" and lines > differ_limit:
+                         print("{:>10} | {:>10} | {:>10} | {:>10} | {:>11} |".format(name, lines, algorithm, "skipped", "-"))
+                         continue
+                    start = time.perf_counter()
+                    difference = list(create_diff(list1, list2, algorithm))
+                    elapsed = time.perf_counter() - start
+                    edits = sum(1 for line in difference if line[:2] in ('- ', '+ '))
+                    print("{:>10} | {:>10} | {:>10} | {:>10.2f} | {:>11} | {}".format(
+                         name, lines, algorithm, elapsed, edits, check_diff(difference, list1, list2)))
+                    del difference
+
+if __name__ == "__main__":
+     sizes, repeated_sizes, distinct, change_rate, differ_limit, repeated_differ_limit = [], [], 16, 0.01, 100000, 500
+     i = 1
+     while i < len(sys.argv):
+          if sys.argv[i] == "-c" and i + 1 < len(sys.argv):
+               change_rate = float(sys.argv[i + 1])
+               i += 1
+          elif sys.argv[i] == "-l" and i + 1 < len(sys.argv):
+               differ_limit = int(sys.argv[i + 1])
+               i += 1
+          elif sys.argv[i] == "-L" and i + 1 < len(sys.argv):
+               repeated_differ_limit = int(sys.argv[i + 1])
+               i += 1
+          elif sys.argv[i] == "-r" and i + 1 < len(sys.argv):
+               repeated_sizes.append(int(sys.argv[i + 1]))
+               i += 1
+          elif sys.argv[i] == "-d" and i + 1 < len(sys.argv):
+               distinct = int(sys.argv[i + 1])
+               i += 1
+          else: sizes.append(int(sys.argv[i]))
+          i += 1
+     benchmark([("unique", generate_files, sizes or [10**5, 10**6, 10**7], differ_limit),
+                ("repeated", lambda lines, rate: generate_repeated_files(lines, rate, distinct),
+                 repeated_sizes or [500, 20000], repeated_differ_limit)], change_rate)
@@ -2,33 +2,142 @@ import sys
 import os
 import mimetypes as tp
 import difflib
+import hashlib
+import mmap
+import shutil
+import struct
+import tempfile
+import zlib
+from bisect import bisect_left
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+# CONSTANTS
+STREAM_CHUNK = 1 << 20    # Bytes read from disk at once in streaming mode
+STREAM_WINDOW = 10000     # Lines of each file held in memory while looking for the end of a difference
+PRECHECK_BLOCK = 1 << 16  # Bytes compared at the start and the end of files before hashing them
+WRITE_BUFFER = 1 << 20    # Bytes of output collected in memory before each write to disk
+BINARY_BLOCK = 1 << 12    # Smallest block matched between binary files
+BINARY_MAX_BLOCKS = 1 << 20  # Block size grows so the first file is split into at most this many blocks
+DELTA_MAGIC = b"FDDELTA1"
+ADLER_MOD = 65521
+CACHE_SIZE = 256          # MiB of cached results kept before least recently used ones are evicted
+CACHE_OPTIONS = ("stream", "window", "algorithm", "unified", "binary", "block")  # Options changing the output
+
+USAGE = """
+USAGE: file_diff.py [options] file1 file2
+       file_diff.py [options] directory1 directory2
+     -s, --stream         Compare files without loading them into memory
+     -w, --window <int>   Max lines of each file kept in memory per difference in streaming mode (default: {})
+     -a, --algorithm <str> Diff algorithm: {} (default: differ)
+     -u, --unified <int>  Write only changed lines with <int> lines of context in unified diff format
+     -j, --jobs <int>     Worker processes comparing directories (default: number of CPUs)
+     -b, --binary         Compare files byte-wise (automatic for files containing NUL bytes)
+     --block <int>        Block size in bytes for binary comparison (default: from file size, min {})
+     --delta <path>       Also write a delta turning file1 into file2 in binary mode
+     --cache              Reuse results of earlier comparisons of unchanged files (on if FILE_DIFF_CACHE is set)
+     --no-cache           Do not read or write the result cache
+     --cache-size <int>   Cache size limit in MiB (default: {})
+""".format(STREAM_WINDOW, ', '.join(("differ", "myers", "patience", "histogram")), BINARY_BLOCK, CACHE_SIZE)
 
 # SCRIPT ARGUMENTS:
 def script_init(arg):
      '''Check if correct arguments were passed and assign them to proper varibles'''
 
+     # Separate options from file paths
+     options = {"stream": False, "window": STREAM_WINDOW, "algorithm": "differ", "jobs": os.cpu_count() or 1,
+                "binary": False, "block": None, "delta": None, "unified": None,
+                "cache": bool(os.environ.get("FILE_DIFF_CACHE")), "cache_size": CACHE_SIZE,
+                "cache_dir": os.environ.get("FILE_DIFF_CACHE") or os.path.join(os.path.expanduser("~"), ".cache", "file_diff")}
+     paths = []
+     no_cache = False
+     i = 1
+     while i < len(arg):
+          if arg[i] in ("-h", "--help"):
+               sys.exit(USAGE)
+          elif arg[i] in ("-s", "--stream"):
+               options["stream"] = True
+          elif arg[i] in ("-w", "--window"):
+               if i + 1 < len(arg) and arg[i + 1].isdigit() and int(arg[i + 1]) > 0:
+                    options["window"] = int(arg[i + 1])
+                    i += 1
+               else: sys.exit("The '-w' or '--window' flag must be followed by a positive integer")
+          elif arg[i] in ("-a", "--algorithm"):
+               if i + 1 < len(arg) and arg[i + 1].lower() in ALGORITHMS:
+                    options["algorithm"] = arg[i + 1].lower()
+                    i += 1
+               else: sys.exit("The '-a' or '--algorithm' flag must be followed by one of: {}".format(', '.join(ALGORITHMS)))
+          elif arg[i] in ("-u", "--unified"):
+               if i + 1 < len(arg) and arg[i + 1].isdigit():
+                    options["unified"] = int(arg[i + 1])
+                    i += 1
+               else: sys.exit("The '-u' or '--unified' flag must be followed by a non-negative integer")
+          elif arg[i] in ("-j", "--jobs"):
+               if i + 1 < len(arg) and arg[i + 1].isdigit() and int(arg[i + 1]) > 0:
+                    options["jobs"] = int(arg[i + 1])
+                    i += 1
+               else: sys.exit("The '-j' or '--jobs' flag must be followed by a positive integer")
+          elif arg[i] in ("-b", "--binary"):
+               options["binary"] = True
+          elif arg[i] == "--block":
+               if i + 1 < len(arg) and arg[i + 1].isdigit() and int(arg[i + 1]) > 0:
+                    options["block"] = int(arg[i + 1])
+                    i += 1
+               else: sys.exit("The '--block' flag must be followed by a positive integer")
+          elif arg[i] == "--delta":
+               if i + 1 < len(arg):
+                    options["delta"] = arg[i + 1]
+                    i += 1
+               else: sys.exit("The '--delta' flag must be followed by a path")
+          elif arg[i] == "--cache":
+               options["cache"] = True
+          elif arg[i] == "--no-cache":
+               options["cache"] = False
+               no_cache = True
+          elif arg[i] == "--cache-size":
+               if i + 1 < len(arg) and arg[i + 1].isdigit():
+                    options["cache_size"] = int(arg[i + 1])
+                    i += 1
+               else: sys.exit("The '--cache-size' flag must be followed by a number of MiB")
+          elif arg[i].startswith('-'):
+               sys.exit("Unknown option: {}\n{}".format(arg[i], USAGE))
+          else: paths.append(arg[i])
+          i += 1
+
+     # Bypass wins over enabling the cache from any source
+     if no_cache: options["cache"] = False
+
      # If number of arguments correct
-     amount_of_arguments = 3
-     if len(arg) < amount_of_arguments: 
-          sys.exit("Script takes {} arguments, {} were given".format(amount_of_arguments, len(arg)))
+     amount_of_arguments = 2
+     if len(paths) != amount_of_arguments: 
+          sys.exit("Script takes {} file paths, {} were given\n{}".format(amount_of_arguments, len(paths), USAGE))
      
      # If files exist
      not_existing_files = []
-     if not os.path.exists(arg[1]): not_existing_files.append(arg[1])
-     if not os.path.exists(arg[2]): not_existing_files.append(arg[2])
+     if not os.path.exists(paths[0]): not_existing_files.append(paths[0])
+     if not os.path.exists(paths[1]): not_existing_files.append(paths[1])
      if not_existing_files: 
           sys.exit("File/s {} do/es not exist".format(', '.join(map(str, not_existing_files))))
      
+     # If both paths are directories or both are files
+     if os.path.isdir(paths[0]) != os.path.isdir(paths[1]):
+          sys.exit("Paths must be both files or both directories")
+     if os.path.isdir(paths[0]):
+          return paths[0], paths[1], options
+
      # If file types are the same
-     mime_type1 = tp.guess_type(arg[1])[0]
-     mime_type2 = tp.guess_type(arg[2])[0]
+     mime_type1 = tp.guess_type(paths[0])[0]
+     mime_type2 = tp.guess_type(paths[1])[0]
      if mime_type1 != mime_type2: 
-          sys.exit("Files have different MIME types:\n{}:\t{}\n{}:\t{}\nFiles must have same MIME type".format(arg[1], mime_type1, arg[2], mime_type2)) 
-     
-     # Load files to variables
+          sys.exit("Files have different MIME types:\n{}:\t{}\n{}:\t{}\nFiles must have same MIME type".format(paths[0], mime_type1, paths[1], mime_type2)) 
+
+     return paths[0], paths[1], options
+
+def load_files(file1_path, file2_path):
+     '''Open both files and read them into lists of lines'''
      try:
-          f1 = open(arg[1], 'r')
-          f2 = open(arg[2], 'r')
+          f1 = open(file1_path, 'r')
+          f2 = open(file2_path, 'r')
           f1_list = f1.readlines()
           f2_list = f2.readlines()
           f1_list[-1] += "\n"
@@ -36,6 +145,35 @@ def script_init(arg):
           return f1, f2, f1_list, f2_list
      except: sys.exit("Unexpected ERROR occured when tryin to open and read files:\n{e}")
 
+# PRE-CHECK
+def file_digest(file_path, chunk_size=STREAM_CHUNK):
+     '''Return hash of file content read in chunk_size blocks'''
+     digest = hashlib.blake2b()
+     with open(file_path, 'rb') as file:
+          for chunk in iter(lambda: file.read(chunk_size), b''):
+               digest.update(chunk)
+     return digest.hexdigest()
+
+def files_identical(file1_path, file2_path):
+     '''Check if files have the same content comparing size, then first and last block, then hashes'''
+     stat1 = os.stat(file1_path)
+     stat2 = os.stat(file2_path)
+     if os.path.samestat(stat1, stat2): return True
+     if stat1.st_size != stat2.st_size: return False
+
+     # Compare first and last block, most different files of equal size differ there
+     size = stat1.st_size
+     with open(file1_path, 'rb') as file1, open(file2_path, 'rb') as file2:
+          if file1.read(PRECHECK_BLOCK) != file2.read(PRECHECK_BLOCK): return False
+          if size > PRECHECK_BLOCK:
+               tail = max(size - PRECHECK_BLOCK, PRECHECK_BLOCK)
+               file1.seek(tail)
+               file2.seek(tail)
+               if file1.read(PRECHECK_BLOCK) != file2.read(PRECHECK_BLOCK): return False
+     if size <= 2 * PRECHECK_BLOCK: return True
+
+     return file_digest(file1_path) == file_digest(file2_path)
+
 # PREPARATION
 def create_diff_file(file1_path, file2_path):
      '''Create and open third file to write to'''
@@ -53,7 +191,7 @@ def create_diff_file(file1_path, file2_path):
 
      # Open a new file
      if not os.path.exists(diff_file_path):
-          diff_file = open(diff_file_path, 'a')
+          diff_file = open(diff_file_path, 'a', buffering=WRITE_BUFFER)
      # Add numeral to name to not overwrite existing file if necessary
      else:
           file_numeral = 1
@@ -61,99 +199,839 @@ def create_diff_file(file1_path, file2_path):
           while True: 
                diff_file_path_temp = fn + "_" + str(file_numeral) + fe
                if not os.path.exists(diff_file_path_temp):
-                    diff_file = open(diff_file_path_temp, 'a')
+                    diff_file = open(diff_file_path_temp, 'a', buffering=WRITE_BUFFER)
                     break
                file_numeral += 1
 
      return diff_file, file1_name, file2_name
 
+# DIFF ENGINES
+def intern_lines(list1, list2):
+     '''Map lines of both lists to integer IDs so engines compare ints instead of strings'''
+     ids = {}
+     return [ids.setdefault(line, len(ids)) for line in list1], [ids.setdefault(line, len(ids)) for line in list2]
+
+def myers_split(a, a_lo, a_hi, b, b_lo, b_hi):
+     '''Split ranges at the middle snake of the shortest edit script (Myers, linear space)'''
+     n = a_hi - a_lo
+     m = b_hi - b_lo
+     max_d = (n + m + 1) // 2
+     offset = max_d
+     size = 2 * max_d + 2
+     # Furthest x reached on every diagonal k, searching forwards (v1) and backwards (v2)
+     v1 = [-1] * size
+     v2 = [-1] * size
+     v1[offset + 1] = 0
+     v2[offset + 1] = 0
+     delta = n - m
+     front = delta % 2 != 0
+     k1start = k1end = k2start = k2end = 0
+     split = None
+
+     for d in range(max_d):
+          # Walk forward path one step
+          for k1 in range(-d + k1start, d + 1 - k1end, 2):
+               k1_offset = offset + k1
+               if k1 == -d or (k1 != d and v1[k1_offset - 1] < v1[k1_offset + 1]):
+                    x1 = v1[k1_offset + 1]
+               else:
+                    x1 = v1[k1_offset - 1] + 1
+               y1 = x1 - k1
+               while x1 < n and y1 < m and a[a_lo + x1] == b[b_lo + y1]:
+                    x1 += 1
+                    y1 += 1
+               v1[k1_offset] = x1
+               if x1 > n: k1end += 2
+               elif y1 > m: k1start += 2
+               elif front:
+                    k2_offset = offset + delta - k1
+                    if 0 <= k2_offset < size and v2[k2_offset] != -1 and x1 >= n - v2[k2_offset]:
+                         split = (x1, y1)
+                         break
+          if split: break
+
+          # Walk reverse path one step
+          for k2 in range(-d + k2start, d + 1 - k2end, 2):
+               k2_offset = offset + k2
+               if k2 == -d or (k2 != d and v2[k2_offset - 1] < v2[k2_offset + 1]):
+                    x2 = v2[k2_offset + 1]
+               else:
+                    x2 = v2[k2_offset - 1] + 1
+               y2 = x2 - k2
+               while x2 < n and y2 < m and a[a_hi - 1 - x2] == b[b_hi - 1 - y2]:
+                    x2 += 1
+                    y2 += 1
+               v2[k2_offset] = x2
+               if x2 > n: k2end += 2
+               elif y2 > m: k2start += 2
+               elif not front:
+                    k1_offset = offset + delta - k2
+                    if 0 <= k1_offset < size and v1[k1_offset] != -1:
+                         x1 = v1[k1_offset]
+                         if x1 >= n - x2:
+                              split = (x1, offset + x1 - k1_offset)
+                              break
+          if split: break
+
+     # No common lines or degenerate split -> whole range changed
+     if split is None or split in ((0, 0), (n, m)):
+          return None
+     x, y = split
+     return [("range", a_lo, a_lo + x, b_lo, b_lo + y), ("range", a_lo + x, a_hi, b_lo + y, b_hi)]
+
+def patience_split(a, a_lo, a_hi, b, b_lo, b_hi):
+     '''Split ranges around the longest ordered run of lines unique in both, fall back to Myers'''
+     # Position of every line occurring exactly once, -1 for repeated lines
+     unique_a = {}
+     for i in range(a_lo, a_hi):
+          unique_a[a[i]] = -1 if a[i] in unique_a else i
+     unique_b = {}
+     for j in range(b_lo, b_hi):
+          unique_b[b[j]] = -1 if b[j] in unique_b else j
+     pairs = [(i, unique_b[line]) for line, i in unique_a.items() if i != -1 and unique_b.get(line, -1) != -1]
+     if not pairs:
+          return myers_split(a, a_lo, a_hi, b, b_lo, b_hi)
+
+     # Longest increasing subsequence of positions in b (patience sorting)
+     tails = []
+     tails_index = []
+     previous = [-1] * len(pairs)
+     for index, (i, j) in enumerate(pairs):
+          pile = bisect_left(tails, j)
+          if pile == len(tails):
+               tails.append(j)
+               tails_index.append(index)
+          else:
+               tails[pile] = j
+               tails_index[pile] = index
+          previous[index] = tails_index[pile - 1] if pile else -1
+     anchors = []
+     index = tails_index[-1]
+     while index != -1:
+          anchors.append(pairs[index])
+          index = previous[index]
+
+     parts = []
+     for i, j in reversed(anchors):
+          parts.append(("range", a_lo, i, b_lo, j))
+          parts.append(("equal", i, i + 1, j, j + 1))
+          a_lo, b_lo = i + 1, j + 1
+     parts.append(("range", a_lo, a_hi, b_lo, b_hi))
+     return parts
+
+HISTOGRAM_MAX_CHAIN = 64  # Lines repeated more often are not used as anchors by the histogram engine
+
+def histogram_split(a, a_lo, a_hi, b, b_lo, b_hi):
+     '''Split ranges around the longest common region grown from the rarest line, fall back to Myers'''
+     occurrences = {}
+     for i in range(a_lo, a_hi):
+          occurrences.setdefault(a[i], []).append(i)
+
+     best = None
+     best_count = HISTOGRAM_MAX_CHAIN
+     best_length = 0
+     j = b_lo
+     while j < b_hi:
+          next_j = j + 1
+          positions = occurrences.get(b[j])
+          if positions is not None and len(positions) <= best_count:
+               for i in positions:
+                    # Grow the match around (i, j) in both directions
+                    start_a, start_b = i, j
+                    while start_a > a_lo and start_b > b_lo and a[start_a - 1] == b[start_b - 1]:
+                         start_a -= 1
+                         start_b -= 1
+                    end_a, end_b = i + 1, j + 1
+                    while end_a < a_hi and end_b < b_hi and a[end_a] == b[end_b]:
+                         end_a += 1
+                         end_b += 1
+                    next_j = max(next_j, end_b)
+                    if len(positions) < best_count or end_a - start_a > best_length:
+                         best = (start_a, end_a, start_b, end_b)
+                         best_count = len(positions)
+                         best_length = end_a - start_a
+          j = next_j
+
+     if best is None:
+          return myers_split(a, a_lo, a_hi, b, b_lo, b_hi)
+     start_a, end_a, start_b, end_b = best
+     return [("range", a_lo, start_a, b_lo, start_b),
+             ("equal", start_a, end_a, start_b, end_b),
+             ("range", end_a, a_hi, end_b, b_hi)]
+
+DIFF_ENGINES = {"myers": myers_split, "patience": patience_split, "histogram": histogram_split}
+ALGORITHMS = ("differ",) + tuple(DIFF_ENGINES)
+
+def diff_opcodes(a, b, split):
+     '''Yield (tag, a_lo, a_hi, b_lo, b_hi) operations turning a into b, split divides a changed range'''
+     stack = [("range", 0, len(a), 0, len(b))]
+     while stack:
+          tag, a_lo, a_hi, b_lo, b_hi = stack.pop()
+          if tag == "equal":
+               yield tag, a_lo, a_hi, b_lo, b_hi
+               continue
+
+          # Strip common prefix
+          start_a, start_b = a_lo, b_lo
+          while a_lo < a_hi and b_lo < b_hi and a[a_lo] == b[b_lo]:
+               a_lo += 1
+               b_lo += 1
+          if a_lo > start_a: yield "equal", start_a, a_lo, start_b, b_lo
+
+          # Strip common suffix, reported after the rest of the range
+          end_a, end_b = a_hi, b_hi
+          while a_hi > a_lo and b_hi > b_lo and a[a_hi - 1] == b[b_hi - 1]:
+               a_hi -= 1
+               b_hi -= 1
+          if a_hi < end_a: stack.append(("equal", a_hi, end_a, b_hi, end_b))
+
+          parts = split(a, a_lo, a_hi, b, b_lo, b_hi) if a_lo < a_hi and b_lo < b_hi else None
+          if parts is None:
+               if a_lo < a_hi: yield "delete", a_lo, a_hi, b_lo, b_lo
+               if b_lo < b_hi: yield "insert", a_hi, a_hi, b_lo, b_hi
+          else:
+               stack.extend(reversed(parts))
+
+def discard_unmatched(a, b):
+     '''Return indexes of lines present in the other list, only those can be part of a common subsequence'''
+     in_a = set(a)
+     in_b = set(b)
+     return [i for i, line in enumerate(a) if line in in_b], [j for j, line in enumerate(b) if line in in_a]
+
+def expand_opcodes(opcodes, index_a, index_b, len_a, len_b):
+     '''Map operations on lists reduced by discard_unmatched back onto the full lists'''
+     ca = cb = 0
+     for tag, a_lo, a_hi, b_lo, b_hi in opcodes:
+          if tag != "equal": continue
+          run_a = run_b = run = 0
+          for k in range(a_hi - a_lo):
+               i = index_a[a_lo + k]
+               j = index_b[b_lo + k]
+               # Extend the current run of equal lines or report it and the changes before this line
+               if run and i == run_a + run and j == run_b + run:
+                    run += 1
+                    continue
+               if run:
+                    yield "equal", run_a, run_a + run, run_b, run_b + run
+                    ca, cb = run_a + run, run_b + run
+               if ca < i: yield "delete", ca, i, cb, cb
+               if cb < j: yield "insert", i, i, cb, j
+               run_a, run_b, run = i, j, 1
+          if run:
+               yield "equal", run_a, run_a + run, run_b, run_b + run
+               ca, cb = run_a + run, run_b + run
+     if ca < len_a: yield "delete", ca, len_a, cb, cb
+     if cb < len_b: yield "insert", len_a, len_a, cb, len_b
+
+def opcodes_to_lines(opcodes, list1, list2):
+     '''Yield Differ-style lines for edit operations, deletions of a change come before its insertions'''
+     inserted = []
+     for tag, a_lo, a_hi, b_lo, b_hi in opcodes:
+          if tag == "delete":
+               for i in range(a_lo, a_hi): yield '- ' + list1[i]
+          elif tag == "insert":
+               inserted.append((b_lo, b_hi))
+          else:
+               for lo, hi in inserted:
+                    for j in range(lo, hi): yield '+ ' + list2[j]
+               inserted.clear()
+               for i in range(a_lo, a_hi): yield '  ' + list1[i]
+     for lo, hi in inserted:
+          for j in range(lo, hi): yield '+ ' + list2[j]
+
 # COMPARISON
-def create_diff(list1, list2):
-     '''Create list containing difference between two lists'''
-     d = difflib.Differ()
-     return list(d.compare(list1, list2))
+def create_diff(list1, list2, algorithm="differ"):
+     '''Return iterator over difference between two lists using one of ALGORITHMS'''
+     if algorithm == "differ":
+          d = difflib.Differ()
+          return d.compare(list1, list2)
+     a, b = intern_lines(list1, list2)
+     index_a, index_b = discard_unmatched(a, b)
+     opcodes = diff_opcodes([a[i] for i in index_a], [b[j] for j in index_b], DIFF_ENGINES[algorithm])
+     return opcodes_to_lines(expand_opcodes(opcodes, index_a, index_b, len(a), len(b)), list1, list2)
 
 def process_diff(difference, f1_name, f2_name):
-     '''Create diff_list containing both lists with their difference messages'''
+     '''Yield lines of both lists with their difference messages'''
      # String constants
      difference_top = "\n##### DIFFERENCE IN FILES #####\n"
      from_1 = "\nFROM FILE {} :\n".format(f1_name)
      from_2 = "\nFROM FILE {} :\n".format(f2_name)
      difference_bot = "\n############# END #############\n\n"
 
-     final_list = []
-     buffer = []
      from_list_1_bool = False
      from_list_2_bool = False
 
      for line in difference:
-          # Lines are the same -> append lines from buffer and this line
+          # Lines are the same -> close difference block if open and pass the line
           if line.startswith('  '):
-               if from_list_1_bool:
-                    buffer.append(difference_bot)
+               if from_list_1_bool or from_list_2_bool:
+                    yield difference_bot
                     from_list_1_bool = False
-               if from_list_2_bool:
-                    buffer.append(difference_bot)
                     from_list_2_bool = False
-               if buffer:
-                    final_list.extend(buffer)
-                    buffer.clear()
-               final_list.append(line[2:])
+               yield line[2:]
 
-          # Line in list 1 only -> add line to the buffer
+          # Line in list 1 only -> open difference block if necessary and pass the line
           elif line.startswith('- '):
                if not from_list_1_bool:
                     if not from_list_2_bool:
-                         buffer.append(difference_top)
-                    buffer.append(from_1)
+                         yield difference_top
+                    yield from_1
                     from_list_1_bool = True
                     from_list_2_bool = False
-               buffer.append(line[2:])
+               yield line[2:]
 
-          # Line in list 2 only -> add line line to the buffer
+          # Line in list 2 only -> open difference block if necessary and pass the line
           elif line.startswith('+ '):
                if not from_list_2_bool:
                     if not from_list_1_bool:
-                         buffer.append(difference_top)
-                    buffer.append(from_2)
+                         yield difference_top
+                    yield from_2
                     from_list_2_bool = True
                     from_list_1_bool = False
-               buffer.append(line[2:])
+               yield line[2:]
 
-     # Add any remaining Elements from the buffer
-     if buffer: 
-          final_list.extend(buffer)
-          final_list.append(difference_bot)
+     # Close the last difference block
+     if from_list_1_bool or from_list_2_bool:
+          yield difference_bot
 
-     return final_list
+def process_unified(difference, f1_name, f2_name, context=3, window=None):
+     '''Yield unified diff of changed lines with context unchanged lines around them
+     hunks longer than window lines are spilled to a temporary file, their header is only known at their end'''
+     before = deque(maxlen=context)  # Unchanged lines waiting to become context of the next change
+     hunk = []
+     spill = None                    # Temporary file with the first lines of a long hunk
+     start1 = start2 = 0             # Lines of each file before the hunk
+     count1 = count2 = 0             # Lines of each file in the hunk
+     trailing = 0                    # Unchanged lines in the hunk after its last change
+     line1 = line2 = 0               # Lines of each file read so far
+     header = "--- {}\n+++ {}\n".format(f1_name, f2_name)
+
+     for line in difference:
+          # Lines are the same -> context of the hunk, or of the next one
+          if line.startswith('  '):
+               if (hunk or spill is not None) and trailing < context:
+                    hunk.append(' ' + line[2:])
+                    count1 += 1
+                    count2 += 1
+                    trailing += 1
+               else:
+                    # Too far from the next change to share context with it -> hunk is finished
+                    if (hunk or spill is not None) and len(before) == context:
+                         yield header + "@@ -{},{} +{},{} @@\n".format(start1 + (count1 > 0), count1, start2 + (count2 > 0), count2)
+                         if spill is not None:
+                              spill.seek(0)
+                              yield from spill
+                              spill.close()
+                              spill = None
+                         yield from hunk
+                         header = ''
+                         hunk = []
+                    before.append(line[2:])
+               line1 += 1
+               line2 += 1
+
+          # Line in one list only -> start a hunk, or join the waiting context to the current one
+          elif line.startswith('- ') or line.startswith('+ '):
+               if not hunk and spill is None:
+                    start1 = line1 - len(before)
+                    start2 = line2 - len(before)
+                    count1 = count2 = 0
+               hunk.extend(' ' + text for text in before)
+               count1 += len(before)
+               count2 += len(before)
+               before.clear()
+               trailing = 0
+               if line.startswith('- '):
+                    hunk.append('-' + line[2:])
+                    count1 += 1
+                    line1 += 1
+               else:
+                    hunk.append('+' + line[2:])
+                    count2 += 1
+                    line2 += 1
+
+          # Keep at most window lines of a hunk in memory
+          if window and len(hunk) >= window:
+               if spill is None:
+                    spill = tempfile.TemporaryFile('w+', encoding='utf-8', errors='surrogateescape', newline='')
+               spill.writelines(hunk)
+               hunk.clear()
+
+     if hunk or spill is not None:
+          yield header + "@@ -{},{} +{},{} @@\n".format(start1 + (count1 > 0), count1, start2 + (count2 > 0), count2)
+          if spill is not None:
+               spill.seek(0)
+               yield from spill
+               spill.close()
+          yield from hunk
+
+def format_diff(difference, f1_name, f2_name, unified=None, window=None):
+     '''Format difference as annotated full files, or as unified diff with unified lines of context'''
+     if unified is None:
+          return process_diff(difference, f1_name, f2_name)
+     return process_unified(difference, f1_name, f2_name, unified, window)
 
 def save_2_diff_file(f1_file, f2_file, diff_file, list):
      '''Save processed diff to a third file and close all three files'''
-     for line in list: 
-          diff_file.write(line)
+     diff_file.writelines(list)
      f1_file.close()
      f2_file.close()
      diff_file.close()
       
-def comparison(f1, f2, diff, l1, l2, f1n, f2n):
-     save_2_diff_file(f1, f2, diff, process_diff(create_diff(l1, l2), f1n, f2n))
-
-# EXIT MESSAGE
-def are_files_identical(file_1_path, diff_path, path_of_diff_file):
-     '''Check if there are any differences, if not delete the diff file'''
-     with open(file_1_path, 'rb') as file1, open(diff_path, 'rb') as file2:
-          content1 = file1.read()
-          content2 = file2.read()
-     if content1 == content2:
-          try: os.remove(path_of_diff_file)
-          except: pass
-          sys.exit("Files are identical")
-     else:
-          sys.exit(f"{path_of_diff_file} file was created")
-   
+def comparison(f1, f2, diff, l1, l2, f1n, f2n, algorithm="differ", unified=None):
+     save_2_diff_file(f1, f2, diff, format_diff(create_diff(l1, l2, algorithm), f1n, f2n, unified))
+
+# STREAMING
+def read_lines(file_path, chunk_size=STREAM_CHUNK):
+     '''Yield lines of a file reading it in chunk_size blocks, the last line always ends with a newline'''
+     with open(file_path, 'r', buffering=chunk_size) as file:
+          for line in file:
+               if not line.endswith("\n"): line += "\n"
+               yield line
+
+def stream_compare(file1_path, file2_path, window=STREAM_WINDOW):
+     '''Yield Differ-style lines for two files holding at most window lines of each file in memory'''
+     lines1 = read_lines(file1_path)
+     lines2 = read_lines(file2_path)
+     # Lines read ahead while looking for the end of a difference, waiting to be compared again
+     pending1 = deque()
+     pending2 = deque()
+
+     def next_line(pending, lines):
+          return pending.popleft() if pending else next(lines, None)
+
+     while True:
+          line1 = next_line(pending1, lines1)
+          line2 = next_line(pending2, lines2)
+          if line1 is None and line2 is None:
+               return
+
+          # Lines are the same -> pass them through
+          if line1 == line2:
+               yield '  ' + line1
+               continue
+
+          # Lines differ -> read both files further until a line common to both ends the difference
+          hunk1 = [] if line1 is None else [line1]
+          hunk2 = [] if line2 is None else [line2]
+          seen1 = {} if line1 is None else {line1: 0}
+          seen2 = {} if line2 is None else {line2: 0}
+          anchor = None
+          while anchor is None:
+               progressed = False
+               if len(hunk1) < window:
+                    line = next_line(pending1, lines1)
+                    if line is not None:
+                         progressed = True
+                         if line in seen2: anchor = (len(hunk1), seen2[line])
+                         seen1.setdefault(line, len(hunk1))
+                         hunk1.append(line)
+               if anchor is None and len(hunk2) < window:
+                    line = next_line(pending2, lines2)
+                    if line is not None:
+                         progressed = True
+                         if line in seen1: anchor = (seen1[line], len(hunk2))
+                         seen2.setdefault(line, len(hunk2))
+                         hunk2.append(line)
+               # Window full or both files exhausted -> report what was gathered as one difference
+               if not progressed: break
+
+          # Give lines after the common one back to be compared again
+          if anchor is not None:
+               pending1.extendleft(reversed(hunk1[anchor[0]:]))
+               pending2.extendleft(reversed(hunk2[anchor[1]:]))
+               del hunk1[anchor[0]:]
+               del hunk2[anchor[1]:]
+
+          for line in hunk1: yield '- ' + line
+          for line in hunk2: yield '+ ' + line
+
+def stream_comparison(file1_path, file2_path, diff, f1n, f2n, window=STREAM_WINDOW, unified=None):
+     '''Compare files without loading them into memory, writing difference blocks as they are found'''
+     with diff:
+          diff.writelines(format_diff(stream_compare(file1_path, file2_path, window), f1n, f2n, unified, window))
+
+# BINARY MODE
+def is_binary(file_path):
+     '''Guess if file is binary by looking for a NUL byte at its start'''
+     with open(file_path, 'rb') as file:
+          return b'\0' in file.read(PRECHECK_BLOCK)
+
+def map_file(file):
+     '''Memory-map an open binary file read-only, empty files give empty bytes'''
+     if os.fstat(file.fileno()).st_size == 0:
+          return b''
+     return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+def block_signatures(basis, block):
+     '''Return weak checksum -> {strong hash: offset} for every whole block of basis'''
+     signatures = {}
+     for offset in range(0, len(basis) - block + 1, block):
+          data = basis[offset:offset + block]
+          signatures.setdefault(zlib.adler32(data), {}).setdefault(hashlib.blake2b(data, digest_size=16).digest(), offset)
+     return signatures
+
+def matching_run(basis, target, basis_offset, target_offset, block):
+     '''Return length of the run of whole blocks equal in basis and target from the given offsets'''
+     run = 0
+     while target_offset + run + block <= len(target) and basis_offset + run + block <= len(basis) and \
+               target[target_offset + run:target_offset + run + block] == basis[basis_offset + run:basis_offset + run + block]:
+          run += block
+     return run
+
+def binary_delta(basis, target, block):
+     '''Yield ("copy", basis offset, target offset, length) and ("literal", target offset, length) covering target'''
+     signatures = block_signatures(basis, block)
+     length = len(target)
+     position = literal_start = 0
+     copy = None
+     weak = None
+     while position + block <= length:
+          if weak is None:
+               # Blocks following the previous copy (or at the same offset at the start) usually match,
+               # compare them directly and skip ahead before rolling the checksum ("next block" heuristic),
+               # the block after the expected one is tried too, in case only the expected block changed in place
+               expected = copy[1] + copy[3] if copy else position
+               for skipped in (0, block):
+                    run = matching_run(basis, target, expected + skipped, position + skipped, block)
+                    if run: break
+               if run:
+                    if skipped:
+                         if copy: yield copy
+                         yield "literal", position, skipped
+                         copy = ("copy", expected + skipped, position + skipped, run)
+                    else:
+                         # Nothing was left between the previous copy and position, it is extended
+                         copy = ("copy", copy[1], copy[2], copy[3] + run) if copy else ("copy", expected, position, run)
+                    position += skipped + run
+                    literal_start = position
+                    continue
+
+               # Checksum of a fresh window, afterwards it is rolled one byte at a time
+               weak = zlib.adler32(target[position:position + block])
+               sum_a = weak & 0xffff
+               sum_b = weak >> 16
+
+          candidates = signatures.get(weak)
+          if candidates:
+               offset = candidates.get(hashlib.blake2b(target[position:position + block], digest_size=16).digest())
+               if offset is not None:
+                    if literal_start < position:
+                         if copy: yield copy
+                         copy = None
+                         yield "literal", literal_start, position - literal_start
+                    # Extend the previous copy if blocks follow each other in both files
+                    if copy and copy[1] + copy[3] == offset and copy[2] + copy[3] == position:
+                         copy = ("copy", copy[1], copy[2], copy[3] + block)
+                    else:
+                         if copy: yield copy
+                         copy = ("copy", offset, position, block)
+                    position += block
+                    literal_start = position
+                    weak = None
+                    continue
+
+          # Roll the Adler-32 checksum over one byte
+          if position + block < length:
+               outgoing = target[position]
+               sum_a = (sum_a - outgoing + target[position + block]) % ADLER_MOD
+               sum_b = (sum_b - block * outgoing + sum_a - 1) % ADLER_MOD
+               weak = (sum_b << 16) | sum_a
+          position += 1
+
+     if copy: yield copy
+     if literal_start < length:
+          yield "literal", literal_start, length - literal_start
+
+def write_delta(delta_path, operations, target, block):
+     '''Save operations as a compact delta: copies reference the first file, literals carry their bytes'''
+     with open(delta_path, 'wb', buffering=STREAM_CHUNK) as delta:
+          delta.write(DELTA_MAGIC + struct.pack("<QQ", block, len(target)))
+          for operation in operations:
+               if operation[0] == "copy":
+                    delta.write(b'C' + struct.pack("<QQ", operation[1], operation[3]))
+               else:
+                    delta.write(b'L' + struct.pack("<Q", operation[2]))
+                    delta.write(target[operation[1]:operation[1] + operation[2]])
+
+def apply_delta(basis_path, delta_path, output_path):
+     '''Rebuild the second file from the first file and a delta written by write_delta'''
+     with open(basis_path, 'rb') as basis, open(delta_path, 'rb') as delta, open(output_path, 'wb') as output:
+          if delta.read(len(DELTA_MAGIC)) != DELTA_MAGIC:
+               raise ValueError("{} is not a file_diff delta".format(delta_path))
+          delta.read(16)
+          while True:
+               kind = delta.read(1)
+               if not kind: break
+               if kind == b'C':
+                    offset, length = struct.unpack("<QQ", delta.read(16))
+                    basis.seek(offset)
+                    output.write(basis.read(length))
+               else:
+                    length, = struct.unpack("<Q", delta.read(8))
+                    output.write(delta.read(length))
+
+def binary_comparison(file1_path, file2_path, diff, f1n, f2n, block=None, delta_path=None):
+     '''Compare binary files block by block, write changed byte ranges of both files and optionally a delta'''
+     with open(file1_path, 'rb') as file1, open(file2_path, 'rb') as file2, diff:
+          basis = map_file(file1)
+          target = map_file(file2)
+          if block is None:
+               block = max(BINARY_BLOCK, 1 << (len(basis) // BINARY_MAX_BLOCKS).bit_length())
+
+          operations = list(binary_delta(basis, target, block))
+          if delta_path:
+               write_delta(delta_path, operations, target, block)
+
+          # Ranges of file 1 never copied into file 2 were removed or changed
+          copies = sorted((operation[1], operation[3]) for operation in operations if operation[0] == "copy")
+          removed = []
+          covered = 0
+          for offset, length in copies:
+               if offset > covered: removed.append((covered, offset - covered))
+               covered = max(covered, offset + length)
+          if covered < len(basis): removed.append((covered, len(basis) - covered))
+          literals = [(operation[1], operation[2]) for operation in operations if operation[0] == "literal"]
+
+          diff.write("BINARY COMPARISON ({} byte blocks)\n{}:\t{} bytes\n{}:\t{} bytes\n".format(
+               block, f1n, len(basis), f2n, len(target)))
+          diff.write("Bytes of {} reused in {}: {}\n".format(f1n, f2n, sum(operation[3] for operation in operations if operation[0] == "copy")))
+          diff.write("\n##### DIFFERENCE IN FILES #####\n")
+          diff.write("\nFROM FILE {} : offset, length\n".format(f1n))
+          diff.writelines("{}, {}\n".format(offset, length) for offset, length in removed)
+          diff.write("\nFROM FILE {} : offset, length\n".format(f2n))
+          diff.writelines("{}, {}\n".format(offset, length) for offset, length in literals)
+          diff.write("\n############# END #############\n\n")
+
+          # Drop views on the maps before the files close
+          del operations, copies
+          if isinstance(basis, mmap.mmap): basis.close()
+          if isinstance(target, mmap.mmap): target.close()
+
+# CACHE
+cache_stats = {"hits": 0, "misses": 0}
+
+def cache_key(file1_path, file2_path, options):
+     '''Key of a comparison built from path, size, mtime and content hash of both files and output options'''
+     parts = []
+     for path in (file1_path, file2_path):
+          stat = os.stat(path)
+          parts.append("{}|{}|{}|{}|{}".format(path, os.path.abspath(path), stat.st_size, stat.st_mtime_ns, file_digest(path)))
+     parts.append(repr([options[name] for name in CACHE_OPTIONS]))
+     return hashlib.sha256("\n".join(parts).encode()).hexdigest()
+
+def cache_fetch(cache_dir, key, diff_file):
+     '''Copy cached result for key into open diff_file, return False if there is none'''
+     entry = os.path.join(cache_dir, key)
+     try:
+          with open(entry, 'rb') as cached:
+               diff_file.flush()
+               shutil.copyfileobj(cached, diff_file.buffer, STREAM_CHUNK)
+          # Mark the entry as recently used
+          os.utime(entry)
+     except FileNotFoundError:
+          cache_stats["misses"] += 1
+          return False
+     cache_stats["hits"] += 1
+     return True
+
+def cache_store(cache_dir, key, output_path):
+     '''Save the result written to output_path under key'''
+     os.makedirs(cache_dir, exist_ok=True)
+     entry = os.path.join(cache_dir, key)
+     temporary = "{}.{}.tmp".format(entry, os.getpid())
+     shutil.copyfile(output_path, temporary)
+     os.replace(temporary, entry)
+
+def cache_evict(cache_dir, max_size):
+     '''Remove least recently used results until the cache takes at most max_size MiB'''
+     entries = []
+     try:
+          with os.scandir(cache_dir) as scanned:
+               for entry in scanned:
+                    if entry.is_file() and not entry.name.endswith(".tmp"):
+                         stat = entry.stat()
+                         entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+     except FileNotFoundError:
+          return
+     total = sum(size for _, size, _ in entries)
+     for _, size, path in sorted(entries):
+          if total <= max_size << 20: break
+          try: os.remove(path)
+          except OSError: pass
+          total -= size
+
+def cache_report(options):
+     '''Print cache hits and misses of this run if the cache is on'''
+     if options["cache"]:
+          print("Cache: {} hits, {} misses".format(cache_stats["hits"], cache_stats["misses"]))
+
+# DIRECTORY MODE
+def list_files(root, errors=None):
+     '''Return dictionary of relative path -> size of every file under root
+     if errors list is given, (relative path, "error: ...") of every entry that can not be read is appended to it'''
+     files = {}
+     stack = [(root, '')]
+     while stack:
+          directory, relative = stack.pop()
+          try:
+               with os.scandir(directory) as entries:
+                    for entry in entries:
+                         entry_relative = os.path.join(relative, entry.name) if relative else entry.name
+                         try:
+                              if entry.is_dir(follow_symlinks=False):
+                                   stack.append((entry.path, entry_relative))
+                              elif entry.is_file():
+                                   files[entry_relative] = entry.stat().st_size
+                         except OSError as e:
+                              if errors is not None: errors.append((entry_relative, "error: {}".format(e)))
+          except OSError as e:
+               # Unreadable directory, its files are not compared but the rest of the tree is
+               if errors is not None: errors.append((relative or os.curdir, "error: {}".format(e)))
+     return files
+
+def create_diff_directory(dir1_path, dir2_path):
+     '''Create directory for the summary and per-file differences next to the first directory'''
+     dir1_path = os.path.abspath(dir1_path)
+     name = "difference_{}_{}".format(os.path.basename(dir1_path), os.path.basename(os.path.abspath(dir2_path)))
+     diff_dir_path = os.path.join(os.path.dirname(dir1_path), name)
+
+     # Add numeral to name to not overwrite existing directory if necessary
+     file_numeral = 1
+     while os.path.exists(diff_dir_path):
+          diff_dir_path = os.path.join(os.path.dirname(dir1_path), "{}_{}".format(name, file_numeral))
+          file_numeral += 1
+     os.makedirs(diff_dir_path)
+     return diff_dir_path
+
+def find_renames(only1, only2, dir1_path, dir2_path, executor, chunksize):
+     '''Pair files missing on one side with files of the same content added on the other side'''
+     # Only files whose size occurs on both sides can have the same content
+     sizes2 = set(only2.values())
+     candidates1 = [rel for rel, size in only1.items() if size in sizes2]
+     sizes1 = set(only1[rel] for rel in candidates1)
+     candidates2 = [rel for rel, size in only2.items() if size in sizes1]
+
+     paths = [os.path.join(dir1_path, rel) for rel in candidates1] + [os.path.join(dir2_path, rel) for rel in candidates2]
+     digests = list(executor.map(file_digest, paths, chunksize=chunksize))
+     added_by_digest = {}
+     for rel, digest in zip(candidates2, digests[len(candidates1):]):
+          added_by_digest.setdefault(digest, []).append(rel)
+
+     renames = []
+     for rel, digest in zip(candidates1, digests[:len(candidates1)]):
+          if added_by_digest.get(digest):
+               renames.append((rel, added_by_digest[digest].pop()))
+     return renames
+
+def diff_pair(task):
+     '''Compare one pair of files in a worker process, return relative path, status and cache hit or None'''
+     relative, file1_path, file2_path, output_path, options = task
+     try:
+          if files_identical(file1_path, file2_path):
+               return relative, "identical", None
+          os.makedirs(os.path.dirname(output_path), exist_ok=True)
+          key = cache_key(file1_path, file2_path, options) if options["cache"] else None
+          if key:
+               with open(output_path, 'w') as diff_file:
+                    if cache_fetch(options["cache_dir"], key, diff_file):
+                         return relative, "changed", True
+
+          if options["binary"] or is_binary(file1_path) or is_binary(file2_path):
+               binary_comparison(file1_path, file2_path, open(output_path, 'w'), file1_path, file2_path, options["block"])
+          else:
+               if options["stream"]:
+                    difference = stream_compare(file1_path, file2_path, options["window"])
+               else:
+                    difference = create_diff(list(read_lines(file1_path)), list(read_lines(file2_path)), options["algorithm"])
+               with open(output_path, 'w', buffering=WRITE_BUFFER) as diff_file:
+                    diff_file.writelines(format_diff(difference, file1_path, file2_path, options["unified"],
+                                                     options["window"] if options["stream"] else None))
+
+          if key: cache_store(options["cache_dir"], key, output_path)
+          return relative, "changed", False if key else None
+     except (OSError, UnicodeDecodeError) as e:
+          # Output is written while comparing, a failed pair must not leave a partial difference behind
+          try: os.remove(output_path)
+          except OSError: pass
+          return relative, "error: {}".format(e), None
+
+def directory_comparison(dir1_path, dir2_path, options):
+     '''Compare files of two directories paired by relative path, return path of the summary or None if identical'''
+     listing_errors = []
+     files1 = list_files(dir1_path, listing_errors)
+     files2 = list_files(dir2_path, listing_errors)
+     # Files under a directory unreadable on one side are not known to be missing there
+     unlisted = tuple('' if rel == os.curdir else rel + os.sep for rel, _ in listing_errors)
+     only1 = {rel: size for rel, size in files1.items() if rel not in files2 and not rel.startswith(unlisted)}
+     only2 = {rel: size for rel, size in files2.items() if rel not in files1 and not rel.startswith(unlisted)}
+     common = sorted(rel for rel in files1 if rel in files2)
+     diff_dir_path = create_diff_directory(dir1_path, dir2_path)
+
+     jobs = options["jobs"]
+     tasks = [(rel, os.path.join(dir1_path, rel), os.path.join(dir2_path, rel),
+               os.path.join(diff_dir_path, rel + ".diff"), options) for rel in common]
+     with ProcessPoolExecutor(max_workers=jobs) as executor:
+          # Many small tasks per worker message, files of a tree are mostly small
+          chunksize = max(1, (len(tasks) + len(only1) + len(only2)) // (jobs * 16))
+          renames = find_renames(only1, only2, dir1_path, dir2_path, executor, chunksize)
+          results = list(executor.map(diff_pair, tasks, chunksize=chunksize))
+
+     for old, new in renames:
+          del only1[old]
+          del only2[new]
+     cache_stats["hits"] += sum(1 for _, _, hit in results if hit is True)
+     cache_stats["misses"] += sum(1 for _, _, hit in results if hit is False)
+     changed = [rel for rel, status, _ in results if status == "changed"]
+     errors = listing_errors + [(rel, status) for rel, status, _ in results if status.startswith("error")]
+     identical = len(results) - len(changed) - len(errors) + len(listing_errors)
+     if not (changed or errors or renames or only1 or only2):
+          os.rmdir(diff_dir_path)
+          return None
+
+     # Write summary
+     summary_path = os.path.join(diff_dir_path, "summary.txt")
+     with open(summary_path, 'w') as summary:
+          summary.write("COMPARED {} WITH {}\n\n".format(dir1_path, dir2_path))
+          summary.write("Identical: {}\nChanged: {}\nRenamed or moved: {}\nOnly in {}: {}\nOnly in {}: {}\nNot compared: {}\n".format(
+               identical, len(changed), len(renames), dir1_path, len(only1), dir2_path, len(only2), len(errors)))
+          sections = (("CHANGED (difference in <path>.diff)", changed),
+                      ("RENAMED OR MOVED", ["{} -> {}".format(old, new) for old, new in sorted(renames)]),
+                      ("ONLY IN {}".format(dir1_path), sorted(only1)),
+                      ("ONLY IN {}".format(dir2_path), sorted(only2)),
+                      ("NOT COMPARED", ["{} ({})".format(rel, status) for rel, status in errors]))
+          for title, lines in sections:
+               if lines:
+                    summary.write("\n##### {} #####\n".format(title))
+                    summary.writelines(line + "\n" for line in lines)
+     return summary_path
 
 # MAIN PROGRAM
-file_1, file_2, f1_lines, f2_lines = script_init(sys.argv)
-diff_file, f1_name, f2_name = create_diff_file(sys.argv[1], sys.argv[2])
-comparison(file_1, file_2, diff_file, f1_lines, f2_lines, f1_name, f2_name)
-are_files_identical(sys.argv[1], sys.argv[2], diff_file.name)
\ No newline at end of file
+if __name__ == "__main__":
+     file1_path, file2_path, options = script_init(sys.argv)
+     if os.path.isdir(file1_path):
+          summary_path = directory_comparison(file1_path, file2_path, options)
+          if options["cache"]: cache_evict(options["cache_dir"], options["cache_size"])
+          cache_report(options)
+          sys.exit(f"{summary_path} file was created" if summary_path else "Directories are identical")
+     if files_identical(file1_path, file2_path):
+          sys.exit("Files are identical")
+
+     # The delta file is a side product the cache does not keep
+     key = cache_key(file1_path, file2_path, options) if options["cache"] and not options["delta"] else None
+     diff_file, f1_name, f2_name = create_diff_file(file1_path, file2_path)
+     if key and cache_fetch(options["cache_dir"], key, diff_file):
+          diff_file.close()
+     else:
+          if options["binary"] or is_binary(file1_path) or is_binary(file2_path):
+               binary_comparison(file1_path, file2_path, diff_file, f1_name, f2_name, options["block"], options["delta"])
+          elif options["stream"]:
+               stream_comparison(file1_path, file2_path, diff_file, f1_name, f2_name, options["window"], options["unified"])
+          else:
+               file_1, file_2, f1_lines, f2_lines = load_files(file1_path, file2_path)
+               comparison(file_1, file_2, diff_file, f1_lines, f2_lines, f1_name, f2_name, options["algorithm"], options["unified"])
+          if key:
+               cache_store(options["cache_dir"], key, diff_file.name)
+               cache_evict(options["cache_dir"], options["cache_size"])
+     cache_report(options)
+     sys.exit(f"{diff_file.name} file was created")
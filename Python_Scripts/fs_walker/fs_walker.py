@@ -0,0 +1,322 @@
+"""
+A directory walker shared by the scripts of this repository.
+
+Directories are listed lazily with `os.scandir`, so the type of every entry (and on Windows
+its size) comes with the listing instead of separate `stat` calls. Excluded directories are
+dropped before the walker descends into them, and names are matched by one precompiled
+`NameMatcher` built from regular expressions and glob patterns.
+
+Key Features:
+- Lists entries of a single directory split into subdirectories and files (`scan_entries`).
+- Walks a tree top-down like `os.walk`, subdirectories removed by the caller are not entered (`walk`).
+- Depth limit, symlink policy and staying on one filesystem.
+- Optional parallel listing on a thread pool, with results in the same order as a serial walk.
+- Unordered parallel walk, threads taking directories from each other when they run out of work (`walk_parallel`).
+- Glob patterns without wildcards in the middle are matched as plain names, prefixes or suffixes.
+
+Functions:
+- `make_matcher(regexes, globs) -> NameMatcher | None`: Compiles patterns into one matcher.
+- `scan_entries(path, include, exclude, follow_symlinks, device, ordered) -> tuple[list, list]`: Lists one directory.
+- `walk(top, include, exclude, max_depth, follow_symlinks, same_filesystem, threads, onerror, ordered)`: Walks a tree.
+- `walk_parallel(top, visit, context, include, exclude, max_depth, follow_symlinks, same_filesystem, threads, onerror)`:
+  Walks a tree on several threads, calling `visit` for every directory.
+
+"""
+import os
+import re
+import time
+import fnmatch
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+# Characters giving a glob pattern its special meaning
+GLOB_CHARS: str = "*?["
+
+class NameMatcher:
+    """
+    Matches entry names against regular expressions and glob patterns compiled once.
+
+    Globs without wildcards are kept in a set of names, `*suffix` and `prefix*` globs
+    are checked with `str.endswith` and `str.startswith`, only the remaining globs and
+    the regular expressions are combined into a single regular expression.
+    Regular expressions are searched for anywhere in the name, globs must match the whole name.
+    The `search` method mirrors the one of `re.Pattern`, so a matcher can be used in its place.
+    """
+    __slots__ = ("names", "prefixes", "suffixes", "regex", "pattern")
+
+    def __init__(self, regexes: list = (), globs: list[str] = ()):
+        names, prefixes, suffixes, combined = set(), [], [], []
+        for glob in globs:
+            wildcards = [index for index, char in enumerate(glob) if char in GLOB_CHARS]
+            if not wildcards:
+                names.add(glob)
+            elif wildcards == [0] and glob[0] == '*':
+                suffixes.append(glob[1:])
+            elif wildcards == [len(glob) - 1] and glob[-1] == '*':
+                prefixes.append(glob[:-1])
+            else:
+                combined.append(f"^(?:{fnmatch.translate(glob)})")
+        for regex in regexes:
+            combined.append(f"(?:{regex.pattern if isinstance(regex, re.Pattern) else regex})")
+
+        self.names: frozenset = frozenset(names)
+        self.prefixes: tuple = tuple(prefixes)
+        self.suffixes: tuple = tuple(suffixes)
+        # A single compiled expression is used as it is, keeping its flags
+        if len(regexes) == 1 and not combined[:-1] and isinstance(regexes[0], re.Pattern):
+            self.regex = regexes[0]
+        else:
+            self.regex = re.compile('|'.join(combined)) if combined else None
+        # Source patterns, identify the matcher like `re.Pattern.pattern` does
+        self.pattern: str = repr(([regex.pattern if isinstance(regex, re.Pattern) else regex for regex in regexes], list(globs)))
+
+    def search(self, name: str) -> bool:
+        """Returns True if name matches any of the patterns."""
+        return (name in self.names
+                or (self.prefixes and name.startswith(self.prefixes))
+                or (self.suffixes and name.endswith(self.suffixes))
+                or (self.regex is not None and self.regex.search(name) is not None))
+
+def make_matcher(regexes=None, globs=None):
+    """
+    Compiles regular expressions and glob patterns into one `NameMatcher`.
+
+    Parameters:
+    - regexes (str | re.Pattern | list | None): Regular expression(s), searched anywhere in a name.
+    - globs (str | list[str] | None): Glob pattern(s), matched against the whole name.
+
+    Returns:
+    - NameMatcher | None: The matcher, None if no pattern was given. A `NameMatcher` is returned as it is.
+    """
+    if isinstance(regexes, NameMatcher):
+        return regexes
+    if isinstance(regexes, (str, re.Pattern)): regexes = [regexes]
+    if isinstance(globs, str): globs = [globs]
+    regexes, globs = [regex for regex in regexes or () if regex], [glob for glob in globs or () if glob]
+    return NameMatcher(regexes, globs) if regexes or globs else None
+
+def scan_entries(path: str, include=None, exclude=None, follow_symlinks: bool = False, device: int = None,
+                 ordered: bool = False) -> tuple[list, list]:
+    """
+    Lists a single directory with `os.scandir`.
+
+    Parameters:
+    - path (str): Directory to list.
+    - include (NameMatcher | None): Files not matching it are left out (directories are always kept).
+    - exclude (NameMatcher | None): Files and directories matching it are left out.
+    - follow_symlinks (bool): Whether symbolic links to directories are listed as directories.
+    - device (int | None): If set, directories on other devices (mount points) are left out.
+    - ordered (bool): Whether the second list holds all entries (subdirectories included) in listing order.
+
+    Returns:
+    - tuple containing:
+        - list[os.DirEntry]: Subdirectories.
+        - list[os.DirEntry]: Files (symbolic links to files included), or all entries if `ordered`.
+
+    Raises:
+    - OSError: If the directory can not be listed. Entries that vanish meanwhile are skipped.
+    """
+    dirs, files = [], []
+    with os.scandir(path) as entries:
+        for entry in entries:
+            name = entry.name
+            if exclude is not None and exclude.search(name):
+                continue
+            try:
+                if entry.is_dir(follow_symlinks=follow_symlinks):
+                    if device is not None and entry.stat(follow_symlinks=follow_symlinks).st_dev != device:
+                        continue
+                    dirs.append(entry)
+                    if ordered: files.append(entry)
+                elif entry.is_file() and (include is None or include.search(name)):
+                    files.append(entry)
+            except OSError:
+                continue  # Entry vanished or can not be accessed
+    return dirs, files
+
+def _walk_policy(top: str, include, exclude, max_depth: int, follow_symlinks: bool, same_filesystem: bool,
+                 onerror, ordered: bool = False) -> tuple:
+    """
+    Returns the functions shared by the walkers, applying their policies.
+
+    Returns:
+    - tuple containing:
+        - callable: `listing(path)`, the result of `scan_entries` or None if the directory can not be listed.
+        - callable: `subdirectories(dirs, depth, ancestors)`, (position in dirs, path, ancestors) of directories to enter.
+        - tuple | None: Ancestors of `top`, (device, inode) pairs used to skip symbolic link cycles.
+    """
+    include, exclude = make_matcher(include), make_matcher(exclude)
+    device = os.stat(top).st_dev if same_filesystem else None
+    if follow_symlinks:
+        info = os.stat(top)
+        ancestors = ((info.st_dev, info.st_ino),)
+    else:
+        ancestors = None  # Without symbolic links a walk has no cycles
+
+    def listing(path: str):
+        try:
+            return scan_entries(path, include, exclude, follow_symlinks, device, ordered)
+        except OSError as error:
+            if onerror is not None: onerror(error)
+            return None
+
+    def subdirectories(dirs: list, depth: int, ancestors: tuple) -> list:
+        # Returns (position, path, ancestors) of directories to enter below a listed one
+        if max_depth is not None and depth + 1 >= max_depth:
+            return []
+        result = []
+        for position, entry in enumerate(dirs):
+            subdirectory_ancestors = None
+            if ancestors is not None:
+                # Symbolic links may lead back to a directory on the current branch
+                try:
+                    info = entry.stat()
+                except OSError:
+                    continue
+                if (info.st_dev, info.st_ino) in ancestors:
+                    continue
+                subdirectory_ancestors = ancestors + ((info.st_dev, info.st_ino),)
+            result.append((position, entry.path, subdirectory_ancestors))
+        return result
+
+    return listing, subdirectories, ancestors
+
+def walk(top: str, include=None, exclude=None, max_depth: int = None, follow_symlinks: bool = False,
+         same_filesystem: bool = False, threads: int = 1, onerror=None, ordered: bool = False):
+    """
+    Walks the directory tree under `top`, directory before its subdirectories, entries in listing order.
+
+    Yields `(dirpath, depth, dirs, files)` for every directory, `top` has depth 0.
+    `dirs` and `files` are lists of `os.DirEntry`; removing entries from `dirs` before
+    resuming the generator prunes them from the walk.
+
+    Parameters:
+    - top (str): Root directory of the walk.
+    - include, exclude (NameMatcher | re.Pattern | str | None): Patterns passed to `make_matcher` and `scan_entries`.
+    - max_depth (int | None): Number of levels listed, entries of `top` are level 1 (None: no limit).
+    - follow_symlinks (bool): Whether to descend into symbolic links to directories (a link back to a directory being walked is not entered).
+    - same_filesystem (bool): Whether to stay on the filesystem of `top`.
+    - threads (int): Number of threads listing whole subtrees ahead of the walk, the order of results does not change.
+    - onerror (callable | None): Called with the OSError of a directory that can not be listed, which is then skipped.
+    - ordered (bool): Whether `files` holds all entries (subdirectories included) in listing order.
+    """
+    listing, subdirectories, ancestors = _walk_policy(top, include, exclude, max_depth, follow_symlinks,
+                                                      same_filesystem, onerror, ordered)
+
+    executor = ThreadPoolExecutor(max_workers=threads) if threads > 1 else None
+    ahead: dict = {}  # path -> future of a listing made ahead of the walk
+    closed: list = [False]
+
+    def listing_ahead(path: str, depth: int, ancestors: tuple):
+        # Lists a directory on a thread and queues its subdirectories at once, so whole subtrees
+        # are listed side by side instead of waiting for the walk to reach them
+        result = listing(path)
+        if result is not None and not closed[0]:
+            for _, subpath, subdirectory_ancestors in subdirectories(result[0], depth, ancestors):
+                try:
+                    ahead[subpath] = executor.submit(listing_ahead, subpath, depth + 1, subdirectory_ancestors)
+                except RuntimeError:
+                    break  # Walk was closed meanwhile
+        return result
+
+    # Stack of (path, depth, ancestors), listings are taken from threads if there are any
+    stack = [(top, 0, ancestors)]
+    if executor is not None:
+        ahead[top] = executor.submit(listing_ahead, top, 0, ancestors)
+    try:
+        while stack:
+            dirpath, depth, ancestors = stack.pop()
+            future = ahead.pop(dirpath, None)
+            result = future.result() if future is not None else listing(dirpath)
+            if result is None:
+                continue
+            dirs, files = result
+            yield dirpath, depth, dirs, files
+
+            # Directories removed from dirs by the caller are left out (if listed ahead, the work is wasted)
+            for _, path, subdirectory_ancestors in reversed(subdirectories(dirs, depth, ancestors)):
+                stack.append((path, depth + 1, subdirectory_ancestors))
+    finally:
+        if executor is not None:
+            closed[0] = True
+            for future in list(ahead.values()):
+                future.cancel()
+            executor.shutdown(wait=False)
+
+def walk_parallel(top: str, visit, context=None, include=None, exclude=None, max_depth: int = None,
+                  follow_symlinks: bool = False, same_filesystem: bool = False, threads: int = 4, onerror=None):
+    """
+    Walks the directory tree under `top` on several threads, in no particular order.
+
+    Each thread walks its own stack of directories depth first and, when it runs out of work,
+    takes the oldest directories (closest to the root, so carrying the most work) of the others.
+    `visit(dirpath, depth, dirs, files, context)` is called on a worker thread for every listed
+    directory, before any of its subdirectories. It gets the context given to the directory by
+    its parent and returns a sequence with the context of each entry of `dirs`, or None.
+    Removing entries from `dirs` before returning prunes them from the walk.
+    With one thread the walk runs on the calling thread, last subdirectory first.
+
+    Parameters:
+    - top (str): Root directory of the walk.
+    - visit (callable): Called for every directory, must be thread-safe if `threads` > 1.
+    - context: Context of `top`.
+    - include, exclude, max_depth, follow_symlinks, same_filesystem, onerror: Same as for `walk`.
+    - threads (int): Number of threads walking the tree.
+
+    Raises:
+    - The first exception raised by `visit`, the other threads then stop.
+    """
+    listing, subdirectories, ancestors = _walk_policy(top, include, exclude, max_depth, follow_symlinks,
+                                                      same_filesystem, onerror)
+    threads = max(threads, 1)
+    stacks = [deque() for _ in range(threads)]
+    stacks[0].append((top, 0, ancestors, context))
+    pending = [1]  # Directories queued or being listed
+    lock = threading.Lock()
+    failed = threading.Event()
+
+    def steal(index: int):
+        for offset in range(1, threads):
+            try:
+                return stacks[(index + offset) % threads].popleft()
+            except IndexError:
+                continue
+        return None
+
+    def worker(index: int):
+        own = stacks[index]
+        try:
+            while not failed.is_set():
+                try:
+                    directory = own.pop()
+                except IndexError:
+                    directory = steal(index)
+                    if directory is None:
+                        with lock:
+                            if not pending[0]:
+                                return
+                        time.sleep(0.001)
+                        continue
+                dirpath, depth, directory_ancestors, directory_context = directory
+                result = listing(dirpath)
+                children = []
+                if result is not None:
+                    dirs, files = result
+                    contexts = visit(dirpath, depth, dirs, files, directory_context)
+                    children = [(path, depth + 1, subdirectory_ancestors, contexts[position] if contexts is not None else None)
+                                for position, path, subdirectory_ancestors in subdirectories(dirs, depth, directory_ancestors)]
+                # Count subdirectories before they become visible to other threads
+                with lock:
+                    pending[0] += len(children) - 1
+                own.extend(children)
+        except BaseException:
+            failed.set()
+            raise
+
+    if threads == 1:
+        worker(0)
+        return
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        for future in [executor.submit(worker, index) for index in range(threads)]:
+            future.result()
@@ -0,0 +1,80 @@
+import os
+import sys
+import time
+import shutil
+import contextlib
+
+from loading_bar import LoadingBar, JSONLinesSink
+
+# Microbenchmark of the per-call overhead of LoadingBar.update and LoadingBar.wrap in a tight loop.
+#
+# USAGE: python benchmark.py [iterations] [-m min_interval]
+#   iterations      Number of updates per measurement (default: 1000000)
+#   -m <float>      Shortest time between redraws of the throttled bar (default: 0.1)
+#   The bar is drawn to os.devnull, so terminal speed does not count. The JSON lines sink,
+#   used when the output is not a terminal, writes there too.
+
+def empty_loop(iterations, min_interval):
+    '''The loop alone, subtracted from the other measurements'''
+    for i in range(iterations):
+        pass
+
+def terminal_size(iterations, min_interval):
+    '''shutil.get_terminal_size as called by every update before it was cached'''
+    for i in range(iterations):
+        shutil.get_terminal_size()
+
+def update_every_call(iterations, min_interval):
+    '''Updates redrawing the bar on every call (min_interval=0)'''
+    bar = LoadingBar(iterations, sink=False)
+    for i in range(iterations):
+        bar.update(i + 1)
+    bar.close(display_statement=False)
+
+def update_throttled(iterations, min_interval):
+    '''Updates redrawing the bar at most once per min_interval'''
+    bar = LoadingBar(iterations, min_interval=min_interval, sink=False)
+    for i in range(iterations):
+        bar.update(i + 1)
+    bar.close(display_statement=False)
+
+def update_sink(iterations, min_interval):
+    '''Updates writing a JSON line at most once per min_interval'''
+    bar = LoadingBar(iterations, sink=JSONLinesSink(interval=min_interval))
+    for i in range(iterations):
+        bar.update(i + 1)
+    bar.close()
+
+def wrapped(iterations, min_interval):
+    '''Iterates over a range wrapped by the loading bar, items are counted in batches'''
+    for i in LoadingBar.wrap(range(iterations), min_interval=min_interval):
+        pass
+
+def measure(loop, iterations, min_interval):
+    '''Returns time of the loop in seconds, with the bar written to os.devnull'''
+    with open(os.devnull, 'w', encoding='utf-8') as devnull, contextlib.redirect_stdout(devnull):
+        start = time.perf_counter()
+        loop(iterations, min_interval)
+        return time.perf_counter() - start
+
+if __name__ == "__main__":
+    iterations, min_interval = 10**6, 0.1
+    i = 1
+    while i < len(sys.argv):
+        if sys.argv[i] == "-m" and i + 1 < len(sys.argv):
+            min_interval = float(sys.argv[i + 1])
+            i += 1
+        else: iterations = int(sys.argv[i])
+        i += 1
+
+    baseline = measure(empty_loop, iterations, min_interval)
+    print(f"{iterations} calls, min_interval = {min_interval}s\n")
+    print(f"{'loop':>18} | {'time [s]':>10} | {'per call [ns]':>13}")
+    for name, loop in (("empty", empty_loop), ("get_terminal_size", terminal_size),
+                       ("update", update_every_call), ("update throttled", update_throttled),
+                       ("update sink", update_sink), ("wrap", wrapped)):
+        # Fewer iterations for the loops drawing every call, they are orders of magnitude slower
+        calls = iterations if loop in (empty_loop, update_throttled, update_sink, wrapped) else max(iterations // 100, 1)
+        elapsed = measure(loop, calls, min_interval)
+        overhead = elapsed / calls - (baseline / iterations if loop is not empty_loop else 0)
+        print(f"{name:>18} | {elapsed:>10.3f} | {overhead * 1e9:>13.1f}")
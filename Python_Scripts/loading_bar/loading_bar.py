@@ -12,8 +12,16 @@
 # Initialization:
 # - Description: Initializes the LoadingBar instance.
 # - Parameters:
-#   - total: Number of calculations or iterations to complete (integer).
+#   - total: Number of calculations or iterations to complete, None if unknown (integer).
 #   - additional_info: Additional information to display (string).
+#   - min_interval: Shortest time between two redraws in seconds, 0 redraws on every update (float, default=0).
+#   - estimator: Rate estimator behind the rate, average and estimated time (default=CumulativeEstimator()).
+#     - CumulativeEstimator(): Average since the start, as before.
+#     - EMAEstimator(time_constant=10.0): Exponential moving average, follows bursty jobs.
+#     - WindowEstimator(window=10.0): Average over the last seconds, forgets a warm-up phase.
+#   - unit: Unit of update weights (e.g. 'B'), the rate is displayed in units per second instead of iterations per second (string).
+#   - sink: JSONLinesSink receiving progress records instead of drawing the bar. When stdout is not a terminal
+#     (cron, containers, redirected output) JSONLinesSink() is used by default, sink=False always draws the bar.
 #
 # Update Method:
 # - Description: Updates the loading bar with progress information.
@@ -21,7 +29,47 @@
 #   - iteration: Current iteration (indexing from 1) (integer).
 #   - additional_info: Additional information about the current state (string).
 #   - skip_every_other: Updates the loading bar every other iteration (default=0, updates every iteration) (integer).
-# - Returns: Percentage of completion (skipping percentages if skip_every_other is set).
+#   - weight: Units done since the last update, e.g. bytes (float).
+# - Returns: Percentage of completion (skipping percentages if skip_every_other is set or no redraw was due).
+# - Throttling: With min_interval set, the bar is redrawn at most once per min_interval and always at the last iteration.
+#   From the current rate the bar predicts the iteration at which a redraw may be due, updates before it return
+#   after a single integer comparison, so the bar can be updated in tight loops.
+# - Terminal width: Read once and cached, the cache is cleared on SIGWINCH (POSIX, handler installed from the main thread).
+#
+# Wrap Method (class method):
+# - Description: Iterates over an iterable while displaying a loading bar, the bar is closed when the iteration ends.
+# - Parameters:
+#   - iterable: Items to iterate over.
+#   - total: Number of items (integer, default=len(iterable) if it has a length, otherwise unknown).
+#   - additional_info: Additional information to display (string).
+#   - min_interval: Shortest time between two redraws in seconds (float, default=0.1).
+#   - estimator, sink: Passed to the loading bar (see Initialization).
+#   - unit: Name of the items (e.g. 'files'), the rate is displayed in units per second instead of 'it/s'.
+# - Returns: Iterator over the items of iterable.
+# - Items are counted in batches (at most _WRAP_BATCH items, fewer if a redraw is due sooner), the bar is
+#   checked once per batch and iterating costs almost nothing over the bare loop.
+#
+# Context Manager:
+# - Description: `with LoadingBar(total) as bar:` closes the bar when the block ends,
+#   the summary statement is displayed only if the block ended without an exception.
+#
+# Follow Method:
+# - Description: Draws the loading bar from a counter on a renderer thread, workers only increment the counter.
+#   All followed bars share one renderer thread and are drawn stacked, one line each (ANSI escape codes), until closed.
+# - Parameters:
+#   - counter: ProgressCounter, multiprocessing.Value or any object with a value attribute, or a callable returning the iteration.
+#   - interval: Time between two redraws in seconds (float, default=min_interval, 0.1 if not set).
+# - Returns: The loading bar (for with statements).
+#
+# Asyncio:
+# - follow_async(counter, interval): Like follow, drawn by a task of the running event loop instead of a thread.
+# - awrap(aiterable, total=None, additional_info=None, min_interval=0.1, estimator=None, unit=None, sink=None):
+#   `async for` over an async iterable, like wrap.
+# - as_completed(aws, additional_info=None, min_interval=0.1, estimator=None, unit=None, sink=None):
+#   `async for` over tasks as they finish.
+#   Completions are counted by done callbacks and the bar is redrawn on a timer, never per completion.
+#
+# Threads: Bars can be updated from several threads, an update finding another thread drawing skips the redraw.
 #
 # Close Method:
 # - Description: Finalizes the loading bar, displaying total time, total iterations, and additional information.
@@ -29,7 +77,34 @@
 #   - display_statement: Whether to display a summary statement with the total number of calculations and time taken (boolean, default=True).
 #   - additional_info: Additional information to display (string).
 #   - clear_loading_bar: Whether to leave the loading bar visible in the console (boolean, default=True).
-# - Returns: Total time taken to complete all calculations in seconds (float).
+# - Returns: Total time taken to complete all calculations in seconds (float). The ProgressStats float also has the attributes
+#   iterations, rate, mean (total time per iteration), p50, p99 (latency of an iteration in seconds) and latencies
+#   (LatencyHistogram). Latencies are sampled: about once per _LATENCY_PERIOD an update reads the clock and the next
+#   one reads it again, timing single iterations even when redraws are throttled, so a slow 1-in-100 item shows in p99.
+#   Followed bars (follow, follow_async, awrap, as_completed) only see a counter and have no latency samples.
+#   The histogram has logarithmic buckets 5% apart, its memory does not grow with the number of iterations.
+#
+# ---
+#
+# Class: JSONLinesSink
+#
+# - Description: Writes one JSON line per interval instead of redrawing the bar, plus a final 'close' record with latency statistics.
+#   Records hold event, elapsed, iteration, total, percentage, rate, eta, info, unit_rate and the custom fields.
+# - Initialization: JSONLinesSink(target=None, interval=10.0, fields=None)
+#   - target: Callable receiving each record as a dict, file descriptor (integer) or file object (default=sys.stdout).
+#   - interval: Shortest time between two records in seconds (float).
+#   - fields: Custom fields added to each record, a dict or a callable returning one.
+#
+# ---
+#
+# Class: ProgressCounter
+#
+# - Description: Counter in shared memory for thread and process pools. Each thread or process increments its own
+#   slot without taking a lock, the value is the sum of all slots.
+# - Initialization: ProgressCounter(slots=os.cpu_count(), mp_context=None), the context of the process pool if not the default one.
+# - register(): Assigns a slot to the calling thread, passed as the initializer of a pool to hand the counter to its workers.
+# - increment(n=1): Increments the counter. Workers of a pool initialized with register() call progress(n=1) instead.
+# - value: Current value (integer).
 #
 # ---
 #
@@ -58,44 +133,155 @@
 #
 # bar.close(True, additional_info="Well that was it") # OUTPUT: Finnished 3 calculations in 30.03s. (Well that was it)
 #
+# Example 3 (tight loop, redrawn at most 10 times a second):
+#
+# bar = LoadingBar(10**7, min_interval=0.1)
+# for i in range(10**7):
+#     bar.update(i + 1)
+# bar.close()
+#
+# Example 4 (wrapped iterable and context manager):
+#
+# for line in LoadingBar.wrap(lines, additional_info="parsing"):
+#     parse(line)
+#
+# with LoadingBar(len(jobs)) as bar:
+#     for i, job in enumerate(jobs):
+#         bar.update(i + 1, job.name)
+#
+# Example 5 (process pool, one bar drawn by a renderer thread):
+#
+# counter = ProgressCounter(4)
+# with LoadingBar(len(files)).follow(counter), ProcessPoolExecutor(4, initializer=counter.register) as pool:
+#     pool.map(parse_file, files) # parse_file calls progress() after each file
+#
+# Example 6 (asyncio, thousands of concurrent requests):
+#
+# async for task in LoadingBar.as_completed(fetch(url) for url in urls):
+#     pages.append(task.result())
+#
+# Example 7 (batch job, one log record a minute):
+#
+# bar = LoadingBar(len(rows), sink=JSONLinesSink(logger.info, 60, fields={"job": "import"}))
+#
 # by Wojciech Kośnik-Kowalczuk (WKK)
 
+import asyncio
+import copy
+import json
+import math
+import multiprocessing
+import os
+import random
 import shutil
+import signal
+import sys
+import threading
 import time
+import weakref
+from collections import deque
+from itertools import chain, islice, tee
+from types import SimpleNamespace
 
 class LoadingBar():
     # Atributes
     _PROGRESS_BAR_CHAR = '\u25B0'
     _EMPTY_BAR_CHAR = '\u2550'
+    _WRAP_BATCH = 1024 # most items counted at once by wrap
+    _LATENCY_PERIOD = 1e-3 # average time between two latency samples in seconds
     _total = None
     _start = None
     _percentage = None
+    _min_interval = 0
+    _last_draw = None
+    _next_iteration = 0 # first iteration leaving the fast path (redraw check or latency sample)
+    _predicted_iteration = 0 # first iteration at which a redraw may be due
+    _checked_iteration = 0 # iteration and time of the last clock read
+    _checked_time = None
+    _columns = None # cached terminal width, cleared on SIGWINCH
+    _resize_handled = False
+    _previous_resize_handler = None
+    _additional_info = None
+    _counter = None
+    _draw_lock = threading.Lock() # held while any bar is drawn
+    _followed = [] # bars drawn by the renderer thread, stacked in this order
+    _renderer = None
+    _render_task = None # asyncio task drawing the bar, see follow_async
+    _estimator = None
+    _unit = None
+    _units = 0 # sum of update weights
+    _unit_estimator = None
+    _iteration = 0 # last drawn iteration
+    _last_iteration = 0 # last updated iteration, drawn or not
+    _latencies = None
+    _sample_due = 1 # iteration at which the next latency sample starts
+    _sample_iteration = 0 # iteration and time of an open latency sample
+    _sample_time = None
+    _sink = None # JSONLinesSink replacing the drawn bar
 
     # Methods
-    def __init__(self, total:int, additional_info:str=None) -> None:
+    def __init__(self, total:int, additional_info:str=None, min_interval:float=0,
+                 estimator=None, unit:str=None, sink=None) -> None:
         '''Initializes the loading bar by setting up \
         attributes and displaying an empty loading bar.
         
         Args:
-        - total: Number of all calculations (iterations) to make.
+        - total: Number of all calculations (iterations) to make, \
+        None if unknown (no percentage and estimated time are displayed).
         - additional_info: Additional information to display.
+        - min_interval: Shortest time between two redraws in seconds \
+        (default=0 - redraw on every update).
+        - estimator: Rate estimator, CumulativeEstimator, EMAEstimator, \
+        WindowEstimator or any object with observe(position, time) and \
+        rate() methods (default=CumulativeEstimator()).
+        - unit: Unit of update weights (e.g. 'B'), the rate is displayed \
+        in units per second instead of iterations per second.
+        - sink: JSONLinesSink receiving progress records instead of \
+        drawing the bar (default=JSONLinesSink() if stdout is not a \
+        terminal, False - always draw the bar).
         '''
         # set atrributes
         self._total = total
-        self._start = time.time()
+        self._start = time.perf_counter()
         self._percentage = 0
+        self._min_interval = min_interval
+        self._last_draw = self._start
+        self._next_iteration = 0
+        self._predicted_iteration = 0
+        self._checked_iteration = 0
+        self._checked_time = self._start
+        self._additional_info = additional_info
+        self._estimator = estimator if estimator is not None else CumulativeEstimator()
+        self._estimator.observe(0, self._start)
+        self._unit = unit
+        self._units = 0
+        if unit is not None:
+            self._unit_estimator = copy.deepcopy(self._estimator)
+        self._iteration = 0
+        self._last_iteration = 0
+        self._latencies = LatencyHistogram()
+        self._sample_due = 1
+        self._sample_time = None
+        if sink is None and sys.stdout is not None and not sys.stdout.isatty():
+            sink = JSONLinesSink()
+        self._sink = sink or None
+        if self._sink is not None:
+            # records are written once per interval, updates in between take the fast path
+            self._min_interval = max(self._min_interval, self._sink.interval)
+            return
 
         # prepare loading bar
         percent_string = f"| 0% |"
-        info_string = f"| 0/{self._total} | " + \
+        info_string = f"| 0/{'?' if self._total is None else self._total} | " + \
                     ((additional_info + " | ") if additional_info else '') + \
                     f"Avgerage | Estimated |"
-        loading_bar_size = shutil.get_terminal_size()[0] - len(info_string) - 9
+        loading_bar_size = self._terminal_width() - len(info_string) - 9
         
         # display empty loading bar
-        print('\r' + percent_string + self._EMPTY_BAR_CHAR * loading_bar_size + info_string, end='')
+        with LoadingBar._draw_lock:
+            print('\r' + percent_string + self._EMPTY_BAR_CHAR * loading_bar_size + info_string, end='')
 
-    def update(self, iteration:int, additional_info:str=None, skip_every_other:int=0) -> int:
+    def update(self, iteration:int, additional_info:str=None, skip_every_other:int=0, weight:float=None) -> int:
         '''Updates the loading bar.
 
         Args:
@@ -103,53 +289,451 @@ class LoadingBar():
         - additional_info: Additional information about the current state.
         - skip_every_other: Update loading bar displays every \
         other iteration (default=0 - every iteration).
+        - weight: Units done since the last update (e.g. bytes), \
+        their rate is displayed if the bar has a unit.
         
         Returns:
-        - percentage (skipping percentages if skip_every_other is set).
-        '''
-        # skip every other iteration
-        if not skip_every_other or (skip_every_other and not iteration%skip_every_other):
-
-            # initialize nmerical variables
-            current_time = time.time()
-            self._percentage = int(iteration/self._total * 100)
-            average_time = (current_time - self._start) / iteration
-            estimated_time = average_time * (self._total - iteration)
-
-            # set time unit for average_time
-            if average_time > 59: # > min
-                average_time_string = f"Avg = {average_time/60:.0f}min | "
-            elif average_time > 1: # > s
-                average_time_string = f"Avg = {average_time:.0f}s | "
-            else: # average_time < 1: # < s
-                average_time_string = f"Avg = {average_time*1000:.0f}ms | "
-
-            # set time unit for estimated_time
-            if estimated_time > 3599: # > hour
-                estimated_time_string = f"Est = {estimated_time/3600:.0f}h | "
-            elif estimated_time > 59: # > min
-                estimated_time_string = f"Est = {estimated_time/60:.0f}min | "
-            else: # estimated_time < 60:
-                estimated_time_string = f"Est = {estimated_time:.0f}s | "
+        - percentage (skipping percentages if skip_every_other is set \
+        or no redraw is due yet).
+        '''
+        self._last_iteration = iteration
+        if weight is not None:
+            self._units += weight
+
+        # fast path: no redraw and no latency sample is due before the predicted iteration
+        if iteration < self._next_iteration:
+            return self._percentage
+        current_time = time.perf_counter()
+        self._sample(iteration, current_time)
+        try:
+            # only a latency sample is due
+            if iteration < self._predicted_iteration:
+                return self._percentage
+
+            # skip every other iteration
+            if not skip_every_other or (skip_every_other and not iteration%skip_every_other):
+                # throttle redraws to one per min_interval (the last iteration is always drawn)
+                if self._min_interval:
+                    remaining_time = self._last_draw + self._min_interval - current_time
+                    if remaining_time > 0 and (self._total is None or iteration < self._total):
+                        self._predict_next_iteration(iteration, current_time, remaining_time)
+                        return self._percentage
+                    self._last_draw = current_time
+                    self._predict_next_iteration(iteration, current_time, self._min_interval)
+
+                # draw unless another thread is drawing (the last iteration waits for it)
+                if not LoadingBar._draw_lock.acquire(self._total is not None and iteration >= self._total):
+                    return self._percentage
+                try:
+                    self._draw(iteration, additional_info, current_time)
+                finally:
+                    LoadingBar._draw_lock.release()
+
+            return self._percentage
+        finally:
+            # a due sample starts once the bar is done, so it times the caller's iteration only
+            if self._sample_time is None and iteration >= self._sample_due:
+                self._sample_iteration, self._sample_time = iteration, time.perf_counter()
+                self._sample_due = iteration + 1
+            self._next_iteration = min(self._predicted_iteration, self._sample_due)
+
+    def _line(self, iteration:int, additional_info:str, current_time:float) -> str:
+        '''Returns the loading bar line of iteration (sets the percentage).'''
+        self._observe(iteration, current_time)
+
+        # initialize nmerical variables
+        self._percentage = int(iteration/self._total * 100) if self._total else 0
+        rate = self._estimator.rate()
+        average_time = 1 / rate if rate else 0
+        estimated_time = average_time * (self._total - iteration) if self._total is not None else None
+        if self._unit_estimator is not None:
+            rate_string = self._rate_string(self._unit_estimator.rate(), self._unit)
+        else:
+            rate_string = self._rate_string(rate, 'it')
+
+        # set time unit for average_time
+        if average_time > 59: # > min
+            average_time_string = f"Avg = {average_time/60:.0f}min | "
+        elif average_time > 1: # > s
+            average_time_string = f"Avg = {average_time:.0f}s | "
+        else: # average_time < 1: # < s
+            average_time_string = f"Avg = {average_time*1000:.0f}ms | "
+
+        # set time unit for estimated_time
+        if estimated_time is None: # unknown total
+            estimated_time_string = "Est = ? | "
+        elif estimated_time > 3599: # > hour
+            estimated_time_string = f"Est = {estimated_time/3600:.0f}h | "
+        elif estimated_time > 59: # > min
+            estimated_time_string = f"Est = {estimated_time/60:.0f}min | "
+        else: # estimated_time < 60:
+            estimated_time_string = f"Est = {estimated_time:.0f}s | "
             
-            # initialize strings
-            percent_string = f"| {self._percentage}% |"
-            info_string = f"| {iteration}/{self._total} | " + \
-                        ((additional_info + " | ") if additional_info else '') + \
-                        average_time_string + estimated_time_string
+        # initialize strings
+        percent_string = f"| {self._percentage}% |"
+        info_string = f"| {iteration}/{'?' if self._total is None else self._total} | " + \
+                    ((additional_info + " | ") if additional_info else '') + \
+                    rate_string + average_time_string + estimated_time_string
+
+        # initialize size
+        loading_bar_size = self._terminal_width() - len(percent_string) - len(info_string) - 1
+
+        return percent_string + \
+                self._PROGRESS_BAR_CHAR * (int(self._percentage / 100 * loading_bar_size)) + \
+                self._EMPTY_BAR_CHAR * (int((100 - self._percentage) / 100 * loading_bar_size)) + \
+                info_string
+
+    def _draw(self, iteration:int, additional_info:str, current_time:float) -> None:
+        '''Draws the loading bar line, or hands a record to the sink when one is due.
+
+        The caller holds the draw lock.
+        '''
+        if self._sink is None:
+            print('\r' + self._line(iteration, additional_info, current_time), end='')
+        elif self._sink.due(current_time):
+            self._sink.emit(self._record(iteration, additional_info, current_time))
+        else:
+            self._observe(iteration, current_time)
+
+    def _record(self, iteration:int, additional_info:str, current_time:float) -> dict:
+        '''Returns the progress record of iteration for a sink.'''
+        self._observe(iteration, current_time)
+        rate = self._estimator.rate()
+        record = {'event': 'progress',
+                  'elapsed': round(current_time - self._start, 3),
+                  'iteration': iteration,
+                  'total': self._total,
+                  'percentage': round(iteration / self._total * 100, 1) if self._total else None,
+                  'rate': round(rate, 3),
+                  'eta': round((self._total - iteration) / rate, 1) if rate and self._total is not None else None}
+        if self._unit_estimator is not None:
+            record['unit'] = self._unit
+            record['unit_rate'] = round(self._unit_estimator.rate(), 3)
+        if additional_info:
+            record['info'] = additional_info
+        return record
+
+    def _observe(self, iteration:int, current_time:float) -> None:
+        '''Feeds a drawn iteration to the estimators.'''
+        if iteration <= self._iteration:
+            return
+        self._iteration = iteration
+        self._estimator.observe(iteration, current_time)
+        if self._unit_estimator is not None:
+            self._unit_estimator.observe(self._units, current_time)
+
+    @staticmethod
+    def _rate_string(rate:float, unit:str) -> str:
+        '''Returns the rate with an SI prefix, e.g. "Rate = 1.5 MB/s | ".'''
+        for prefix in ('', 'k', 'M', 'G', 'T'):
+            if rate < 999.95:
+                break
+            rate /= 1000
+        return f"Rate = {rate:.1f} {prefix}{unit}/s | "
+
+    def _sample(self, iteration:int, current_time:float) -> None:
+        '''Closes an open latency sample and schedules the next one.
+
+        A sample is started by the clock read at the end of an update \
+        and closed by the next update leaving the fast path, so it is the \
+        latency of the iterations in between (one, unless updates skip \
+        iterations). Samples start about _LATENCY_PERIOD apart, at random \
+        iterations so periodic workloads are not aliased, and updates in \
+        between keep the fast path.
+        '''
+        if self._sample_time is None:
+            return
+        items = iteration - self._sample_iteration
+        if items <= 0:
+            return
+        latency = (current_time - self._sample_time) / items
+        self._latencies.add(latency)
+        self._sample_time = None
+        stride = self._LATENCY_PERIOD / max(latency, LatencyHistogram._SMALLEST)
+        self._sample_due = iteration + 1 + int(random.random() * 2 * stride)
+
+    def _predict_next_iteration(self, iteration:int, current_time:float, remaining_time:float) -> None:
+        '''Sets the iteration before which updates skip the clock.
+
+        Half of the iterations expected within remaining_time at the rate \
+        since the previous clock read are skipped, at most twice as many \
+        as since that read, so the clock is read a few times per interval \
+        even if the rate drops. The last iteration is never skipped.
+        '''
+        items = iteration - self._checked_iteration
+        elapsed_time = current_time - self._checked_time
+        rate = items / elapsed_time if elapsed_time > 0 else 0
+        self._predicted_iteration = iteration + 1 + min(int(rate * remaining_time / 2), 2 * max(items, 0))
+        self._checked_iteration, self._checked_time = iteration, current_time
+        if self._total is not None:
+            self._predicted_iteration = min(self._predicted_iteration, self._total)
+
+    @classmethod
+    def wrap(cls, iterable, total:int=None, additional_info:str=None, min_interval:float=0.1,
+             estimator=None, unit:str=None, sink=None):
+        '''Iterates over iterable while displaying a loading bar.
+
+        Items are counted in batches, one batch lasting until the next \
+        redraw may be due (at most _WRAP_BATCH items), so the bar is \
+        checked once per batch instead of once per item. The bar is \
+        closed when the iteration ends, with the summary statement \
+        only if all items were iterated over.
+
+        Args:
+        - iterable: Items to iterate over.
+        - total: Number of items (default=len(iterable), unknown if \
+        iterable has no length).
+        - additional_info: Additional information to display.
+        - min_interval: Shortest time between two redraws in seconds.
+        - estimator, sink: Passed to the loading bar.
+        - unit: Name of the items (e.g. 'files'), each item weighs one unit.
+
+        Returns:
+        - Iterator over the items of iterable.
+        '''
+        if total is None:
+            try:
+                total = len(iterable)
+            except TypeError:
+                pass
+        bar = cls(total, additional_info, min_interval, estimator, unit, sink)
+        # the second iterator trails the first one and counts batches once they were iterated over
+        items, counted = tee(iterable)
+        return chain.from_iterable(bar._batches(items, counted))
+
+    def _batches(self, items, counted):
+        '''Yields batches of items for wrap, updating the loading bar after each batch.'''
+        iteration = 0
+        finished = False
+        try:
+            while True:
+                size = min(max(self._next_iteration - iteration, 1), self._WRAP_BATCH)
+                yield islice(items, size)
+                batch = len(list(islice(counted, size)))
+                iteration += batch
+                if batch < size:
+                    # all items iterated over, the total is known now
+                    self._total = iteration
+                    self._next_iteration = self._predicted_iteration = 0
+                    self.update(iteration, weight=batch)
+                    finished = True
+                    return
+                self.update(iteration, weight=batch)
+        finally:
+            self.close(display_statement=finished)
+
+    def follow(self, counter, interval:float=None) -> 'LoadingBar':
+        '''Draws the loading bar from a counter on a renderer thread.
+
+        Workers only increment the counter, a single renderer thread \
+        reads it and draws the bar, so workers never wait for the bar. \
+        All followed bars share the thread and are drawn stacked, one \
+        line each (nested tasks), until they are closed. A followed bar \
+        is not updated by hand.
+
+        Args:
+        - counter: ProgressCounter, multiprocessing.Value or any object \
+        with a value attribute, or a callable returning the iteration.
+        - interval: Time between two redraws in seconds \
+        (default=min_interval of the bar, 0.1 if not set).
+
+        Returns:
+        - The loading bar (for with statements).
+        '''
+        if interval is not None:
+            self._min_interval = interval
+        elif not self._min_interval:
+            self._min_interval = 0.1
+        self._counter = counter
+        with LoadingBar._draw_lock:
+            LoadingBar._followed.append(self)
+            if LoadingBar._renderer is None:
+                LoadingBar._renderer = threading.Thread(target=LoadingBar._render_followed,
+                                                        name="LoadingBar renderer", daemon=True)
+                LoadingBar._renderer.start()
+        return self
+
+    def _counter_value(self) -> int:
+        '''Returns the current iteration of a followed bar.'''
+        return self._counter() if callable(self._counter) else self._counter.value
+
+    @staticmethod
+    def _render_followed() -> None:
+        '''Renderer thread, draws the followed bars until all of them are closed.'''
+        while True:
+            with LoadingBar._draw_lock:
+                bars = LoadingBar._followed
+                if not bars:
+                    LoadingBar._renderer = None
+                    return
+                # one line per bar, then back to the first line (bars with a sink write records instead)
+                current_time = time.perf_counter()
+                width = LoadingBar._terminal_width()
+                lines = []
+                for bar in bars:
+                    if bar._sink is None:
+                        lines.append(bar._line(bar._counter_value(), bar._additional_info, current_time)[:width - 1])
+                    else:
+                        bar._draw(bar._counter_value(), bar._additional_info, current_time)
+                if lines:
+                    print('\r' + '\x1b[K\n'.join(lines) + '\x1b[K' + \
+                          (f"\x1b[{len(lines) - 1}A" if len(lines) > 1 else '') + '\r', end='')
+                    sys.stdout.flush()
+                interval = min(bar._min_interval for bar in bars)
+            time.sleep(interval)
+
+    def follow_async(self, counter, interval:float=None) -> 'LoadingBar':
+        '''Draws the loading bar from a counter on a task of the running event loop.
+
+        The task redraws the bar on a timer, so coroutines only increment \
+        the counter and never wait for terminal output. Must be called \
+        from a coroutine, the task is cancelled by close().
+
+        Args:
+        - counter: Any object with a value attribute, or a callable returning the iteration.
+        - interval: Time between two redraws in seconds \
+        (default=min_interval of the bar, 0.1 if not set).
+
+        Returns:
+        - The loading bar (for with statements).
+        '''
+        if interval is not None:
+            self._min_interval = interval
+        elif not self._min_interval:
+            self._min_interval = 0.1
+        self._counter = counter
+        self._render_task = asyncio.get_running_loop().create_task(self._render_async())
+        return self
+
+    async def _render_async(self) -> None:
+        '''Render task, redraws the loading bar every min_interval until the bar is closed.'''
+        while True:
+            if LoadingBar._draw_lock.acquire(blocking=False):
+                try:
+                    self._draw(self._counter_value(), self._additional_info, time.perf_counter())
+                finally:
+                    LoadingBar._draw_lock.release()
+            await asyncio.sleep(self._min_interval)
 
-            # initialize size
-            loading_bar_size = shutil.get_terminal_size()[0] - len(percent_string) - len(info_string) - 1
+    @classmethod
+    async def awrap(cls, aiterable, total:int=None, additional_info:str=None, min_interval:float=0.1,
+                    estimator=None, unit:str=None, sink=None):
+        '''Iterates over an async iterable (`async for`) while displaying a loading bar.
 
-            # print all
-            print("\r" + percent_string + \
-                    self._PROGRESS_BAR_CHAR * (int(self._percentage / 100 * loading_bar_size)) + \
-                    self._EMPTY_BAR_CHAR * (int((100 - self._percentage) / 100 * loading_bar_size)) + \
-                    info_string, end='')
+        Items are only counted, the bar is drawn by a render task \
+        (follow_async). The bar is closed when the iteration ends, with \
+        the summary statement only if all items were iterated over.
 
-        return self._percentage
+        Args:
+        - aiterable: Async iterable of items.
+        - total: Number of items (default=len(aiterable), unknown if \
+        it has no length).
+        - additional_info: Additional information to display.
+        - min_interval: Time between two redraws in seconds.
+        - estimator, sink: Passed to the loading bar.
+        - unit: Name of the items (e.g. 'files'), each item weighs one unit.
+
+        Returns:
+        - Async iterator over the items of aiterable.
+        '''
+        if total is None:
+            try:
+                total = len(aiterable)
+            except TypeError:
+                pass
+        bar = cls(total, additional_info, min_interval, estimator, unit, sink)
+        counter = SimpleNamespace(value=0)
+        bar.follow_async(counter)
+        finished = False
+        try:
+            async for item in aiterable:
+                yield item
+                counter.value += 1
+                bar._units += 1
+            # all items iterated over, the total is known now
+            bar._total = counter.value
+            finished = True
+        finally:
+            bar.close(display_statement=finished)
+
+    @classmethod
+    async def as_completed(cls, aws, additional_info:str=None, min_interval:float=0.1,
+                           estimator=None, unit:str=None, sink=None):
+        '''Yields the tasks of aws as they finish while displaying a loading bar.
+
+        Completions are counted by done callbacks, without terminal \
+        output, and the bar is drawn by a render task (follow_async). \
+        Tasks finishing out of order are counted when they finish, \
+        not when they are yielded.
+
+        Args:
+        - aws: Awaitables (coroutines are scheduled as tasks).
+        - additional_info: Additional information to display.
+        - min_interval: Time between two redraws in seconds.
+        - estimator, sink: Passed to the loading bar.
+        - unit: Name of the tasks (e.g. 'requests'), each task weighs one unit.
+
+        Returns:
+        - Async iterator over finished tasks, call result() to get the result.
+        '''
+        tasks = {asyncio.ensure_future(aw) for aw in aws}
+        bar = cls(len(tasks), additional_info, min_interval, estimator, unit, sink)
+        counter = SimpleNamespace(value=0)
+        done = asyncio.Queue()
+
+        def finish(task):
+            counter.value += 1
+            bar._units += 1
+            done.put_nowait(task)
+
+        for task in tasks:
+            task.add_done_callback(finish)
+        bar.follow_async(counter)
+        finished = False
+        try:
+            for _ in range(len(tasks)):
+                yield await done.get()
+            finished = True
+        finally:
+            bar.close(display_statement=finished)
+
+    def __enter__(self) -> 'LoadingBar':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> bool:
+        self.close(display_statement=exc_type is None)
+        return False
+
+    @classmethod
+    def _terminal_width(cls) -> int:
+        '''Returns the terminal width, read once and cached until the terminal is resized.'''
+        if cls._columns is None:
+            LoadingBar._columns = shutil.get_terminal_size()[0]
+            cls._handle_resize()
+        return cls._columns
+
+    @classmethod
+    def _handle_resize(cls) -> None:
+        '''Installs a SIGWINCH handler clearing the cached terminal width.
+
+        Signal handlers can only be installed from the main thread and \
+        SIGWINCH exists on POSIX only, elsewhere the width stays cached.
+        '''
+        if cls._resize_handled or not hasattr(signal, 'SIGWINCH') \
+                or threading.current_thread() is not threading.main_thread():
+            return
+        LoadingBar._previous_resize_handler = signal.getsignal(signal.SIGWINCH)
+        signal.signal(signal.SIGWINCH, LoadingBar._on_resize)
+        LoadingBar._resize_handled = True
+
+    @classmethod
+    def _on_resize(cls, signum, frame) -> None:
+        '''SIGWINCH handler, clears the cached width and calls the previous handler.'''
+        LoadingBar._columns = None
+        if callable(LoadingBar._previous_resize_handler):
+            LoadingBar._previous_resize_handler(signum, frame)
 
-    def close(self, display_statement:bool=True, additional_info:str=None, clear_loading_bar:bool=True) -> float:
+    def close(self, display_statement:bool=True, additional_info:str=None, clear_loading_bar:bool=True) -> 'ProgressStats':
         '''
         Finalizes the loading bar by displaying total time, \
         total iterations and additional information.
@@ -161,40 +745,341 @@ class LoadingBar():
         - clear_loading_bar: Whether to leave the loading bar visible in the console.
         
         Returns:
-        - Total time taken to complete all calculations in seconds.
+        - Total time taken to complete all calculations in seconds, \
+        a float with statistics of the run as attributes (ProgressStats).
         '''
-        # clear loading bar
-        if clear_loading_bar:
-            print('\r', end='')
-        else:
-            print()
+        with LoadingBar._draw_lock:
+            # followed bars are not updated, their counter tells how far they got
+            iteration = self._counter_value() if self._counter is not None else self._last_iteration
+
+            # stop following, the bar is drawn once more from the counter
+            if self._counter is not None:
+                if self in LoadingBar._followed:
+                    LoadingBar._followed.remove(self)
+                    if self._sink is None:
+                        # clear the stacked bars, the others are drawn again below
+                        print('\r\x1b[J', end='')
+                if self._render_task is not None:
+                    self._render_task.cancel()
+                    self._render_task = None
+                if not clear_loading_bar and self._sink is None:
+                    print('\r' + self._line(iteration, self._additional_info, time.perf_counter()), end='')
+
+            # write the final record instead of the statement
+            if self._sink is not None:
+                current_time = time.perf_counter()
+                record = self._record(iteration, additional_info or self._additional_info, current_time)
+                stats = ProgressStats(current_time - self._start, iteration, self._latencies)
+                record.update(event='close', finished=display_statement, mean=stats.mean, p50=stats.p50, p99=stats.p99)
+                self._sink.emit(record)
+                return stats
 
-        # get total time
-        total_time = time.time() - self._start
+            # clear loading bar
+            if clear_loading_bar:
+                print('\r', end='')
+            else:
+                print()
 
-        # display final information
-        statement = ''
-        if display_statement:
+            # get total time
+            total_time = time.perf_counter() - self._start
 
-            # set time units if necessary
-            if total_time > 3599: # > hour
-                total_time_str = f"{total_time/3600:.2f}h"
-            elif total_time > 59: # > min
-                total_time_str = f"{total_time/60:.2f}min"
-            else: # total_time < min
-                total_time_str = f"{total_time:.2f}s"
+            # display final information
+            statement = ''
+            if display_statement:
 
-            # set statement
-            statement = f"\rFinnished {self._total} calculations in {total_time_str}."
+                # set time units if necessary
+                if total_time > 3599: # > hour
+                    total_time_str = f"{total_time/3600:.2f}h"
+                elif total_time > 59: # > min
+                    total_time_str = f"{total_time/60:.2f}min"
+                else: # total_time < min
+                    total_time_str = f"{total_time:.2f}s"
+
+                # set statement
+                statement = f"\rFinnished {self._total if self._total is not None else iteration} calculations in {total_time_str}."
         
-        # append additional info
-        statement += ((' (' if statement else '') + additional_info + (')' if statement else '')) \
-            if additional_info else ''
+            # append additional info
+            statement += ((' (' if statement else '') + additional_info + (')' if statement else '')) \
+                if additional_info else ''
 
-        print(statement, end='')
+            print(statement, end='')
         
-        # clear rest of the line
-        if clear_loading_bar:
-            print(' ' * (shutil.get_terminal_size()[0] - len(statement) - 1))
+            # clear rest of the line
+            if clear_loading_bar:
+                print(' ' * (self._terminal_width() - len(statement) - 1))
+
+            return ProgressStats(total_time, iteration, self._latencies)
+
+
+class JSONLinesSink():
+    '''Writes progress records as JSON lines at most once per interval.
+
+    Replaces the drawn bar when the output is not a terminal (cron jobs, \
+    containers), so logs get one line per interval instead of a redraw \
+    per update. A record holds event ('progress' or 'close' with latency \
+    statistics), elapsed, iteration, total, percentage, rate, eta, info \
+    and the custom fields.
+    '''
+    def __init__(self, target=None, interval:float=10.0, fields=None) -> None:
+        '''
+        Args:
+        - target: Callable receiving each record as a dict, file \
+        descriptor (integer) or file object (default=sys.stdout).
+        - interval: Shortest time between two records in seconds \
+        (the final record is always written).
+        - fields: Custom fields added to each record, a dict or a \
+        callable returning one.
+        '''
+        self.target = target if target is not None else sys.stdout
+        self.interval = interval
+        self.fields = fields
+        self._next_time = 0
+
+    def due(self, current_time:float) -> bool:
+        '''Returns True (once per interval) if a record is to be written at current_time (time.perf_counter()).'''
+        if current_time < self._next_time:
+            return False
+        self._next_time = current_time + self.interval
+        return True
+
+    def emit(self, record:dict) -> None:
+        '''Adds the custom fields to record and writes it to the target.'''
+        if self.fields:
+            record.update(self.fields() if callable(self.fields) else self.fields)
+        if callable(self.target):
+            self.target(record)
+            return
+        line = json.dumps(record, separators=(',', ':'), default=str) + '\n'
+        if isinstance(self.target, int):
+            os.write(self.target, line.encode())
+        else:
+            self.target.write(line)
+            self.target.flush()
+
+class CumulativeEstimator():
+    '''Average rate since the start (steady jobs).'''
+    def __init__(self) -> None:
+        self._first_position = self._first_time = None
+        self._position = self._time = None
+
+    def observe(self, position:float, current_time:float) -> None:
+        '''Adds a sample: position (iterations or units done) at current_time.'''
+        if self._first_time is None:
+            self._first_position, self._first_time = position, current_time
+        self._position, self._time = position, current_time
+
+    def rate(self) -> float:
+        '''Returns the estimated rate in positions per second (0 if unknown).'''
+        elapsed_time = self._time - self._first_time
+        return (self._position - self._first_position) / elapsed_time if elapsed_time > 0 else 0
+
+class EMAEstimator():
+    '''Exponential moving average of the rate (bursty jobs, recent samples weigh more).'''
+    def __init__(self, time_constant:float=10.0) -> None:
+        '''
+        Args:
+        - time_constant: Seconds after which a sample weighs 1/e of a new one.
+        '''
+        self._time_constant = time_constant
+        self._last = None
+        self._rate = None
+
+    def observe(self, position:float, current_time:float) -> None:
+        '''Adds a sample: position (iterations or units done) at current_time.'''
+        if self._last is not None:
+            elapsed_time = current_time - self._last[1]
+            if elapsed_time <= 0:
+                return
+            rate = (position - self._last[0]) / elapsed_time
+            if self._rate is None:
+                self._rate = rate
+            else:
+                # samples are irregular, the weight of a sample grows with its duration
+                self._rate += (1 - math.exp(-elapsed_time / self._time_constant)) * (rate - self._rate)
+        self._last = (position, current_time)
+
+    def rate(self) -> float:
+        '''Returns the estimated rate in positions per second (0 if unknown).'''
+        return self._rate or 0
+
+class WindowEstimator():
+    '''Average rate over the last seconds (jobs with a warm-up phase).'''
+    def __init__(self, window:float=10.0) -> None:
+        '''
+        Args:
+        - window: Seconds of samples the rate is computed from.
+        '''
+        self._window = window
+        self._samples = deque()
+
+    def observe(self, position:float, current_time:float) -> None:
+        '''Adds a sample: position (iterations or units done) at current_time.'''
+        samples = self._samples
+        samples.append((position, current_time))
+        # keep one sample older than the window, the rate spans the whole window
+        while len(samples) > 2 and current_time - samples[1][1] >= self._window:
+            samples.popleft()
+
+    def rate(self) -> float:
+        '''Returns the estimated rate in positions per second (0 if unknown).'''
+        if len(self._samples) < 2:
+            return 0
+        (first_position, first_time), (last_position, last_time) = self._samples[0], self._samples[-1]
+        return (last_position - first_position) / (last_time - first_time) if last_time > first_time else 0
+
+class LatencyHistogram():
+    '''Streaming histogram of latencies in logarithmic buckets.
+
+    Bucket bounds grow by _GROWTH, so quantiles are exact within half \
+    of it. Memory is bounded by the number of buckets between \
+    _SMALLEST and the longest latency, not by the number of samples.
+    '''
+    _GROWTH = 1.05
+    _SMALLEST = 1e-9 # seconds, shorter latencies fall into the first bucket
+
+    def __init__(self) -> None:
+        self._buckets = {} # bucket index -> weight
+        self._count = 0
+        self._sum = 0.0
+        self._scale = 1 / math.log(self._GROWTH)
+        self._offset = math.log(self._SMALLEST)
+
+    def add(self, latency:float, weight:int=1) -> None:
+        '''Adds weight samples of latency seconds.'''
+        index = int((math.log(latency) - self._offset) * self._scale) if latency > self._SMALLEST else 0
+        self._buckets[index] = self._buckets.get(index, 0) + weight
+        self._count += weight
+        self._sum += latency * weight
+
+    @property
+    def count(self) -> int:
+        '''Number of samples.'''
+        return self._count
+
+    @property
+    def mean(self) -> float:
+        '''Mean latency in seconds (0 without samples).'''
+        return self._sum / self._count if self._count else 0.0
+
+    def quantile(self, q:float) -> float:
+        '''Returns the latency in seconds below which a fraction q of the samples lie (0 without samples).'''
+        if not self._count:
+            return 0.0
+        rank = q * self._count
+        cumulative = 0
+        for index in sorted(self._buckets):
+            cumulative += self._buckets[index]
+            if cumulative >= rank:
+                break
+        return self._SMALLEST * self._GROWTH ** (index + 0.5)
+
+class ProgressStats(float):
+    '''Total time in seconds returned by LoadingBar.close(), with statistics of the run as attributes.
+
+    Attributes:
+    - iterations: Last updated iteration (counter value of a followed bar).
+    - rate: Iterations per second over the whole run.
+    - mean: Total time per iteration in seconds.
+    - p50, p99: Median and 99th percentile latency of an iteration in seconds, \
+    from sampled iterations (0 for followed bars, which only see a counter).
+    - latencies: LatencyHistogram of sampled iteration latencies.
+    '''
+    def __new__(cls, total_time:float, iterations:int=0, latencies:LatencyHistogram=None) -> 'ProgressStats':
+        if latencies is None:
+            latencies = LatencyHistogram()
+        stats = super().__new__(cls, total_time)
+        stats.iterations = iterations
+        stats.rate = iterations / total_time if total_time > 0 else 0.0
+        stats.mean = total_time / iterations if iterations > 0 else 0.0
+        stats.p50 = latencies.quantile(0.5)
+        stats.p99 = latencies.quantile(0.99)
+        stats.latencies = latencies
+        return stats
+
+class ProgressCounter():
+    '''Progress counter shared by threads and processes.
+
+    Each thread or process increments its own slot of a shared memory \
+    array, so incrementing takes no lock. Reading the value sums up \
+    all slots. Threads and processes beyond the number of slots share \
+    one slot guarded by a lock.
+    '''
+    _registered = None # counter registered in this process, used by progress()
+    _instances = weakref.WeakSet()
+
+    def __init__(self, slots:int=os.cpu_count() or 1, mp_context=None) -> None:
+        '''Creates the counter in shared memory.
+
+        Args:
+        - slots: Number of threads or processes incrementing the counter.
+        - mp_context: Multiprocessing context of the processes, the same \
+        one as given to the process pool (default=the default context).
+        '''
+        context = mp_context or multiprocessing.get_context()
+        self._counts = context.Array('q', slots + 1, lock=False) # slot 0 is shared
+        self._last_slot = context.Value('i', 0)
+        self._local = threading.local()
+        ProgressCounter._instances.add(self)
+
+    def register(self) -> int:
+        '''Assigns a slot to the calling thread and makes the counter \
+        the one used by progress() in this process.
+
+        Pass as the initializer of a process or thread pool, so workers \
+        get the counter: `ProcessPoolExecutor(n, initializer=counter.register)`.
+
+        Returns:
+        - Slot of the thread (0 if all slots are taken).
+        '''
+        with self._last_slot.get_lock():
+            slot = self._last_slot.value + 1
+            if slot < len(self._counts):
+                self._last_slot.value = slot
+            else:
+                slot = 0
+        self._local.slot = slot
+        ProgressCounter._registered = self
+        return slot
+
+    def increment(self, n:int=1) -> None:
+        '''Increments the counter by n (registers the calling thread on first use).'''
+        slot = getattr(self._local, 'slot', None)
+        if slot is None:
+            slot = self.register()
+        if slot:
+            self._counts[slot] += n
+        else:
+            with self._last_slot.get_lock():
+                self._counts[0] += n
+
+    @property
+    def value(self) -> int:
+        '''Sum of all slots.'''
+        return sum(self._counts)
+
+    def __getstate__(self) -> dict:
+        # slots belong to threads of one process, a new process registers again
+        state = self.__dict__.copy()
+        del state['_local']
+        return state
+
+    def __setstate__(self, state:dict) -> None:
+        self.__dict__.update(state)
+        self._local = threading.local()
+        ProgressCounter._instances.add(self)
+
+    @staticmethod
+    def _after_fork() -> None:
+        '''A forked process inherits the slots of the forking thread, it registers again.'''
+        for counter in ProgressCounter._instances:
+            counter._local = threading.local()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=ProgressCounter._after_fork)
+
+def progress(n:int=1) -> None:
+    '''Increments the ProgressCounter registered in this process by n.
 
-        return total_time
+    Called by workers of a pool created with `initializer=counter.register`.
+    '''
+    ProgressCounter._registered.increment(n)
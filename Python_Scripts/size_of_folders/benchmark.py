@@ -0,0 +1,78 @@
+import os
+import sys
+import time
+import shutil
+import tempfile
+
+from size_of_folders import scan_folder_tree
+
+# Benchmark of the os.scandir scanner against the former os.walk + os.path.getsize scan.
+#
+# USAGE: python benchmark.py [directory]
+#   Without a directory a temporary tree of 1000 folders with 100 files each is generated.
+#   The 'os.stat calls' column counts Python calls of os.stat (os.path.getsize goes through it), not syscalls:
+#   DirEntry.stat() does not call os.stat, yet on POSIX it still makes one stat syscall per file.
+#   Syscalls can be counted with e.g. `strace -f -c -e trace=%stat python benchmark.py`.
+
+class StatCounter:
+    '''Counts Python calls of os.stat, those made by DirEntry.stat() are not seen'''
+    def __init__(self):
+        self.calls = 0
+        self._stat = os.stat
+
+    def __call__(self, *args, **kwargs):
+        self.calls += 1
+        return self._stat(*args, **kwargs)
+
+def walk_scan(root_folder):
+    '''The former scan: os.walk lists every folder, then every file is stat-ed again by its path'''
+    return [sum(os.path.getsize(os.path.join(dirpath, f)) for f in filenames)
+            for dirpath, dirnames, filenames in os.walk(root_folder)]
+
+def scandir_scan(root_folder):
+    '''Sizes of files directly inside each folder as collected by size_of_folders'''
+    return scan_folder_tree(root_folder)[2]
+
+def generate_tree(root, folders=1000, files=100):
+    '''Creates folders in a shallow tree, each with files of different sizes'''
+    for folder in range(folders):
+        path = os.path.join(root, f"group_{folder % 10}", f"folder_{folder}")
+        os.makedirs(path)
+        for file in range(files):
+            with open(os.path.join(path, f"file_{file}.bin"), 'wb') as f:
+                f.write(b'\0' * (file % 7))
+
+def measure(scan, root_folder):
+    '''Returns time, total size and number of os.stat calls of a full scan'''
+    counter = StatCounter()
+    os.stat = counter
+    try:
+        start = time.perf_counter()
+        total = sum(scan(root_folder))
+        elapsed = time.perf_counter() - start
+    finally:
+        os.stat = counter._stat
+    return elapsed, total, counter.calls
+
+if __name__ == "__main__":
+    temporary = None
+    if len(sys.argv) > 1:
+        root_folder = sys.argv[1]
+    else:
+        temporary = root_folder = tempfile.mkdtemp()
+        print("Generating tree...", end='\r')
+        generate_tree(root_folder)
+
+    try:
+        files = sum(len(filenames) for _, _, filenames in os.walk(root_folder))
+        print(f"{files} files in {root_folder}\n")
+        print(f"{'scanner':>10} | {'time [s]':>10} | {'total [B]':>12} | {'os.stat calls':>13} | {'per file':>8}")
+        for name, scan in (("os.walk", walk_scan), ("scandir", scandir_scan)):
+            # Warm the cache so both scanners read metadata from memory
+            measure(scan, root_folder)
+            elapsed, total, calls = measure(scan, root_folder)
+            print(f"{name:>10} | {elapsed:>10.3f} | {total:>12} | {calls:>13} | {calls / max(files, 1):>8.2f}")
+        print("\nBoth scanners make one stat syscall per file on POSIX (scandir through DirEntry.stat(), none on Windows),")
+        print("the time saved is the path join and the os.path.getsize call made for every file.")
+    finally:
+        if temporary: shutil.rmtree(temporary)
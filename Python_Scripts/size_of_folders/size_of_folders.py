@@ -1,8 +1,30 @@
 import os
 import re
+import errno
 import sys
-import subprocess
-from collections import defaultdict # Provides default value for a nonexistent key
+import time
+import threading
+import heapq
+import hashlib
+import sqlite3
+import select
+import struct
+import stat
+import ctypes
+import ctypes.util
+import shutil
+import functools
+import json
+import csv
+from itertools import islice, chain
+
+try:
+    from ..fs_walker.fs_walker import make_matcher, scan_entries, walk, walk_parallel
+except ImportError:
+    # Run as a script, the walker is found next to this script's folder
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from fs_walker.fs_walker import make_matcher, scan_entries, walk, walk_parallel
+from concurrent.futures import ProcessPoolExecutor
 
 # Utility functions
 def get_case_insensitive_item(dictionary, target_key):
@@ -11,28 +33,20 @@ def get_case_insensitive_item(dictionary, target_key):
         if key.lower() == target_key.lower():
             return key, value
     return None, None  # If not found, return None for both
-def get_terminal_size_windows():
-    '''Returns tuple of rows and columns of a console, default None'''
-    try:
-        output = subprocess.check_output(['mode', 'con'], shell=True).decode('utf-8')
-        lines = output.split('\n')
-        for line in lines:
-            if 'Lines' in line:
-                rows = int(line.split(':')[1].strip())
-            elif 'Columns' in line:
-                columns = int(line.split(':')[1].strip())
-        return rows, columns
-    except:
-        return None
-def paginate(lines, lines_per_page):
-    '''Dislays given text lines_per_page lines at the time'''
-    lines -= 2
-    if not lines_per_page: lines_per_page = 25
-    for i in range(0, len(lines), lines_per_page):
-        print('\n'.join(lines[i:i+lines_per_page]))
-        print("Press arrow UP/DOWN")
-
-        os.system('clear')
+@functools.lru_cache(maxsize=None)
+def get_terminal_size():
+    '''Returns tuple of rows and columns of a console (fallback 24 x 80), asked once and cached'''
+    columns, rows = shutil.get_terminal_size()
+    return rows, columns
+def paginate(lines, lines_per_page=None):
+    '''Dislays given text lines_per_page lines at the time (default: one screen), Enter shows next page, q quits'''
+    if not lines_per_page: lines_per_page = max(get_terminal_size()[0] - 2, 1)
+    lines = iter(lines)
+    while True:
+        page = list(islice(lines, lines_per_page))
+        if not page: return
+        print('\n'.join(page))
+        if input("-- Enter: next page, q: quit --").strip().lower() == 'q': return
 
 # Parameters of the script
 def process_flags(argv):
@@ -44,6 +58,23 @@ def process_flags(argv):
     -d 'path'  Set directory (default: current)
     -t 'int'   Set bottom threshold file/directory size in kilo-bytes [kb] (default: 0)
     -e 'regex' Set regular expresion to exclude files and directories that mach it
+    -g 'glob'  Exclude files and directories whose whole name matches glob pattern (repeatable, e.g. -g '*.log' -g .git)
+    -j 'int'   Set number of threads scanning the directory tree (default: 1)
+    -n 'int'   Show only 'int' largest folders (default: all)
+    -i 'path'  Keep folder index in 'path' and re-list only folders modified since the last run
+               (files changed in place, without adding or removing entries, are not noticed; -j is ignored)
+    --duplicates
+               List folders by size of duplicate files inside (copies beyond the first one found),
+               files are compared by size, then by hash of their ends, then by hash of the whole content
+               (-j sets number of hashing processes, default: number of CPUs)
+    --format 'ndjson'|'csv'
+               Stream rows of path, size in bytes, number of files and depth to stdout (or -o file)
+               as soon as each folder is measured, subfolders come before their folder
+               (-n keeps only 'int' largest folders and sorts them; -j, -i and -u are ignored)
+    -o 'path'  Write --format rows to file at 'path' instead of stdout
+    -p         Show the table page by page
+    --watch    Keep watching the directory (Linux only) and redraw the largest folders as they change
+               (-n sets number of rows, default: fits the terminal; -j and -i are ignored)
 
     Accepted units:
     'bit' bits
@@ -61,7 +92,7 @@ def process_flags(argv):
         sys.exit(help_output)
 
     # Initialize default flag values
-    flags = {'-u': 'mib', '-d': os.getcwd(), '-e': None, '-t': 0}
+    flags = {'-u': 'mib', '-d': os.getcwd(), '-e': None, '-g': [], '-t': 0, '-j': 1, '-n': 0, '-i': None, '--duplicates': False, '--watch': False, '--format': None, '-o': None, '-p': False}
     
     # Check arguments for flags
     i = 1  # Skip the script name
@@ -81,6 +112,11 @@ def process_flags(argv):
             flags['-e'] = argv[i+1]
             i += 1
 
+        # check for excluding glob
+        elif argv[i] == '-g' and i+1 < len(argv):
+            flags['-g'].append(argv[i+1])
+            i += 1
+
          # check for size threshold
         elif argv[i] == '-t' and i + 1 < len(argv):
             try:
@@ -90,6 +126,55 @@ def process_flags(argv):
                 print(f"\nInvalid size threshold: {argv[i + 1]}")
                 sys.exit(help_output)
 
+        # check for number of threads
+        elif argv[i] == '-j' and i + 1 < len(argv):
+            if argv[i + 1].isdigit() and int(argv[i + 1]) > 0:
+                flags['-j'] = int(argv[i + 1])
+                i += 1
+            else:
+                print(f"\nInvalid number of threads: {argv[i + 1]}")
+                sys.exit(help_output)
+
+        # check for number of folders shown
+        elif argv[i] == '-n' and i + 1 < len(argv):
+            if argv[i + 1].isdigit():
+                flags['-n'] = int(argv[i + 1])
+                i += 1
+            else:
+                print(f"\nInvalid number of folders: {argv[i + 1]}")
+                sys.exit(help_output)
+
+        # check for index file
+        elif argv[i] == '-i' and i + 1 < len(argv):
+            flags['-i'] = argv[i + 1]
+            i += 1
+
+        # check for duplicates mode
+        elif argv[i] == '--duplicates':
+            flags['--duplicates'] = True
+
+        # check for output format
+        elif argv[i] == '--format' and i + 1 < len(argv):
+            if argv[i + 1].lower() in ('ndjson', 'csv'):
+                flags['--format'] = argv[i + 1].lower()
+                i += 1
+            else:
+                print(f"\nInvalid output format: {argv[i + 1]}")
+                sys.exit(help_output)
+
+        # check for output file
+        elif argv[i] == '-o' and i + 1 < len(argv):
+            flags['-o'] = argv[i + 1]
+            i += 1
+
+        # check for pagination
+        elif argv[i] == '-p':
+            flags['-p'] = True
+
+        # check for watch mode
+        elif argv[i] == '--watch':
+            flags['--watch'] = True
+
         # default case
         else: 
             print(f"\nUnknown argument or missing value: {argv[i]}")
@@ -105,61 +190,557 @@ def process_flags(argv):
                    'B': 8, 'KB': 8*1000, 'MB': 8*(1000**2), 'GB': 8*(1000**3), 'TB': 8*(1000**4),
                    'KiB': 8*1024, 'MiB': 8*(2**20), 'GiB': 8*(2**30), 'TiB': 8*(2**40)}
     unit_argument = flags['-u']
-    exclude_regex = flags['-e']
+    try:
+        exclude_regex = make_matcher(flags['-e'], flags['-g'])
+    except re.error as e:
+        print(f"\nInvalid regular expression: {e}")
+        sys.exit(help_output)
     size_threshold = flags['-t'] * 1000 # bytes to kb
     correct_key, unit_value = get_case_insensitive_item(valid_units, unit_argument)
 
     if correct_key is not None:
-        return root_folder, correct_key, unit_value, exclude_regex, size_threshold
+        return root_folder, correct_key, unit_value, exclude_regex, size_threshold, flags['-j'], flags['-n'], flags['-i'], flags['--watch'], flags['--duplicates'], flags['--format'], flags['-o'], flags['-p']
     else:
         print(f"Invalid unit: {unit_argument}\n{help_output}")
         sys.exit()
 
+# Scanning
+def entries_size(entries, files=None):
+    '''Returns size of given file entries, skips unreadable ones
+    if files list is given, (path, size, device, inode) of every file is appended to it'''
+    folder_size = 0
+    for entry in entries:
+        try:
+            info = entry.stat()
+        except OSError:
+            continue  # Entry vanished or can not be accessed
+        folder_size += info.st_size
+        if files is not None:
+            files.append((entry.path, info.st_size, info.st_dev, info.st_ino))
+    return folder_size
+
+def scan_folder(dirpath, exclude_pattern=None, files=None):
+    '''Returns (path, name) of subfolders of dirpath and size of files directly inside it, skips unreadable entries
+    if files list is given, (path, size, device, inode) of every file is appended to it'''
+    try:
+        # Files and directories matching the exclusion pattern are left out
+        dirs, entries = scan_entries(dirpath, exclude=exclude_pattern)
+    except OSError:
+        return [], 0  # Directory can not be listed
+    return [(entry.path, entry.name) for entry in dirs], entries_size(entries, files)
+
+# Folder tree is kept as parallel lists indexed by folder: name, index of parent folder
+# and size of files directly inside. Root has index 0, every folder has a larger index than its parent.
+def scan_folder_tree(root_folder, exclude_pattern=None, files=None, threads=1):
+    '''Walks the tree with fs_walker.walk_parallel (threads > 1 steal folders from each other), returns names, parents and sizes
+    if files list is given, (folder index, path, size, device, inode) of every file is appended to it'''
+    names, parents, sizes = [root_folder], [-1], [0]
+    lock = threading.Lock()
+
+    def visit(dirpath, depth, dirs, entries, index):
+        folder_files = [] if files is not None else None
+        folder_size = entries_size(entries, folder_files)
+        # Subfolders are numbered when their parent is scanned, so they get larger indices
+        with lock:
+            sizes[index] = folder_size
+            if folder_files:
+                files.extend((index, *file) for file in folder_files)
+            first = len(names)
+            names.extend(entry.name for entry in dirs)
+            parents.extend([index] * len(dirs))
+            sizes.extend([0] * len(dirs))
+        return range(first, first + len(dirs))
+
+    walk_parallel(root_folder, visit, 0, exclude=exclude_pattern, threads=threads)
+    return names, parents, sizes
+
+# Same as scan_folder_tree, folders not modified since the previous run are read from an SQLite index
+def scan_folder_tree_incremental(root_folder, exclude_pattern=None, index_path=None):
+    '''Stats every folder but lists only those whose mtime changed, returns names, parents and sizes'''
+    connection = sqlite3.connect(index_path)
+    with connection:
+        connection.execute("CREATE TABLE IF NOT EXISTS settings (id INTEGER PRIMARY KEY, value TEXT)")
+        # Paths and names are stored as bytes (os.fsencode), names that are not valid UTF-8 can not be stored as text
+        connection.execute("CREATE TABLE IF NOT EXISTS folders (path BLOB PRIMARY KEY, mtime_ns INTEGER, size INTEGER, children BLOB)")
+        # Index built for another root, other exclusions or an older format can not be reused
+        settings = repr(("bytes", root_folder, exclude_pattern.pattern if exclude_pattern else None))
+        row = connection.execute("SELECT value FROM settings WHERE id = 0").fetchone()
+        if row is None or row[0] != settings:
+            connection.execute("DELETE FROM folders")
+            connection.execute("INSERT OR REPLACE INTO settings VALUES (0, ?)", (settings,))
+
+    names, parents, sizes = [root_folder], [-1], [0]
+    stack = [(root_folder, 0)]
+    relisted = 0
+    with connection:
+        while stack:
+            dirpath, index = stack.pop()
+            try:
+                mtime = os.stat(dirpath).st_mtime_ns
+            except OSError:
+                continue  # Folder vanished or can not be accessed
+
+            row = connection.execute("SELECT mtime_ns, size, children FROM folders WHERE path = ?", (os.fsencode(dirpath),)).fetchone()
+            children = [os.fsdecode(name) for name in row[2].split(b'/')] if row and row[2] else []
+            if row and row[0] == mtime:
+                # Entries of the folder did not change -> reuse its size and subfolders
+                sizes[index] = row[1]
+                subfolders = [(os.path.join(dirpath, name), name) for name in children]
+            else:
+                subfolders, sizes[index] = scan_folder(dirpath, exclude_pattern)
+                relisted += 1
+                connection.execute("INSERT OR REPLACE INTO folders VALUES (?, ?, ?, ?)",
+                                   (os.fsencode(dirpath), mtime, sizes[index], b'/'.join(os.fsencode(name) for _, name in subfolders)))
+                # Forget subtrees of subfolders that are gone ('0' is the character after the separator)
+                for name in set(children).difference(name for _, name in subfolders):
+                    path = os.fsencode(os.path.join(dirpath, name))
+                    connection.execute("DELETE FROM folders WHERE path = ? OR (path > ? AND path < ?)",
+                                       (path, path + os.fsencode(os.sep), path + bytes([ord(os.sep) + 1])))
+
+            for path, name in subfolders:
+                stack.append((path, len(names)))
+                names.append(name)
+                parents.append(index)
+                sizes.append(0)
+    connection.close()
+
+    print(f"Index: {relisted} of {len(names)} folders re-listed.")
+    return names, parents, sizes
+
+def total_sizes(parents, sizes):
+    '''Returns sizes of whole subtrees, adding each folder to its parent once, children before parents'''
+    totals = list(sizes)
+    for index in range(len(parents) - 1, 0, -1):
+        totals[parents[index]] += totals[index]
+    return totals
+
+def folder_path(names, parents, index):
+    '''Rebuilds full path of a folder from its ancestors'''
+    parts = []
+    while index > 0:
+        parts.append(names[index])
+        index = parents[index]
+    return os.path.join(names[0], *reversed(parts))
+
 # Returns list of folders sorted by size (descending)
 def list_folder_sizes(flags):
     print("\nParsing folder...", end='\r')
 
-    root_folder, unit_abbreviation, unit_divider, exclude_regex, size_threshold = flags
-    folder_sizes = defaultdict(int)
-    compiled_regex = re.compile(exclude_regex) if exclude_regex else None
-    
-    for dirpath, dirnames, filenames in os.walk(root_folder):
-        # Exclude files and directories matching the regex
-        if compiled_regex:
-            dirnames[:] = [d for d in dirnames if not compiled_regex.search(d)]
-            filenames = [f for f in filenames if not compiled_regex.search(f)]
-
-        # Calulate size
-        folder_size = sum(os.path.getsize(os.path.join(dirpath, f)) for f in filenames)
-        
-        # Add this folder's size to all its parents
-        while dirpath != root_folder:
-            folder_sizes[dirpath] += folder_size
-            dirpath = os.path.dirname(dirpath)
-            
-        folder_sizes[root_folder] += folder_size  # Add to root folder
+    root_folder, unit_abbreviation, unit_divider, exclude_regex, size_threshold, threads, top, index_path = flags[:8]
+    exclude_pattern = make_matcher(exclude_regex)
+    if index_path:
+        names, parents, sizes = scan_folder_tree_incremental(root_folder, exclude_pattern, index_path)
+    else:
+        names, parents, sizes = scan_folder_tree(root_folder, exclude_pattern, threads=threads)
+    totals = total_sizes(parents, sizes)
+    del sizes
 
     # Applying the threshold size
-    filtered_folders = { folder: size for folder, size in folder_sizes.items() if size >= size_threshold }
+    filtered_folders = (index for index in range(len(totals)) if totals[index] >= size_threshold)
         
     print("All needed information gattered.\n")
 
-    # Sort by size and return
+    # Sort by size (only the largest folders if requested) and return
     print("Sorting elements...", end= '\r')
-    folders_table = []
-    for folder, size in sorted(filtered_folders.items(), key=lambda x: x[1], reverse=True):
-        folders_table += [f"{(size*8)//unit_divider} {unit_abbreviation}:\t{folder}"]
-
+    if top:
+        selected = heapq.nlargest(top, filtered_folders, key=totals.__getitem__)
+    else:
+        selected = sorted(filtered_folders, key=totals.__getitem__, reverse=True)
     print("All elements sorted.  \n")
-    return folders_table
+
+    # Rows are formatted one at a time, while being printed
+    return (f"{(totals[index]*8)//unit_divider} {unit_abbreviation}:\t{folder_path(names, parents, index)}" for index in selected)
+
+# Folders are walked depth first and each is reported once all its subfolders are done,
+# only folders on the current branch are kept in memory
+def walk_folder_sizes(root_folder, exclude_pattern=None):
+    '''Yields (path, size, number of files, depth) of every folder in post-order, sizes and counts include subfolders'''
+    stack = []  # [path, size, number of files] of folders on the current branch, index is the depth
+    files = []
+    # Folders deeper than or as deep as the next one are done, the final depth 0 closes the whole branch
+    for dirpath, depth, dirs, entries in chain(walk(root_folder, exclude=exclude_pattern), [(None, 0, None, None)]):
+        while len(stack) > depth:
+            path, size, count = stack.pop()
+            yield path, size, count, len(stack)
+            if stack:
+                stack[-1][1] += size
+                stack[-1][2] += count
+        if dirpath is None:
+            return
+        files.clear()
+        size = entries_size(entries, files)
+        stack.append([dirpath, size, len(files)])
+
+# Streams folder sizes as NDJSON or CSV rows
+def export_folder_sizes(flags):
+    root_folder, _, _, exclude_regex, size_threshold, _, top = flags[:7]
+    output_format, output_path = flags[10:12]
+    exclude_pattern = make_matcher(exclude_regex)
+
+    rows = (row for row in walk_folder_sizes(root_folder, exclude_pattern) if row[1] >= size_threshold)
+    if top:
+        rows = heapq.nlargest(top, rows, key=lambda row: row[1])
+
+    output = open(output_path, 'w', newline='', encoding='utf-8', errors='surrogateescape') if output_path else sys.stdout
+    try:
+        if output_format == 'csv':
+            writer = csv.writer(output)
+            writer.writerow(('path', 'bytes', 'files', 'depth'))
+            writer.writerows(rows)
+        else:
+            for path, size, files, depth in rows:
+                output.write(json.dumps({'path': path, 'bytes': size, 'files': files, 'depth': depth}) + '\n')
+    except BrokenPipeError:
+        # Reader stopped early (e.g. head), silence the final flush of stdout
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+    finally:
+        if output_path: output.close()
+
+# Duplicate files are narrowed down in stages: same size, then same hash of the first and last
+# HASH_EDGE bytes, only then the whole content is hashed, so files of a unique size are never read
+HASH_EDGE = 4096       # Bytes hashed at each end of a file in the quick stage
+HASH_BLOCK = 1 << 20   # Size of sequential reads when hashing whole files
+
+def edge_hash(path):
+    '''Returns hash of the first and last HASH_EDGE bytes of a file, None if it can not be read'''
+    try:
+        with open(path, 'rb') as f:
+            digest = hashlib.blake2b(f.read(HASH_EDGE))
+            if f.seek(0, os.SEEK_END) > HASH_EDGE:
+                f.seek(max(f.tell() - HASH_EDGE, HASH_EDGE))
+                digest.update(f.read(HASH_EDGE))
+        return digest.digest()
+    except OSError:
+        return None
+
+def content_hash(path):
+    '''Returns hash of the whole file read in HASH_BLOCK chunks, None if it can not be read'''
+    try:
+        digest = hashlib.blake2b()
+        with open(path, 'rb', buffering=0) as f:
+            while block := f.read(HASH_BLOCK):
+                digest.update(block)
+        return digest.digest()
+    except OSError:
+        return None
+
+def group_by_hash(groups, hash_function, executor):
+    '''Splits every group of paths by hash_function computed in the executor, keeps groups of two or more'''
+    paths = [path for group in groups for path in group]
+    hashes = executor.map(hash_function, paths, chunksize=max(len(paths) // 256, 1))
+    split = {}
+    for group_index, group in enumerate(groups):
+        for path in group:
+            digest = next(hashes)
+            if digest is not None:
+                split.setdefault((group_index, digest), []).append(path)
+    return [group for group in split.values() if len(group) > 1]
+
+def find_duplicates(files, threads=None):
+    '''Takes (folder_index, path, size, dev, inode) of files, returns groups of paths with identical content'''
+    by_size = {}
+    for folder_index, path, size, device, inode in files:
+        if size:
+            by_size.setdefault(size, []).append((folder_index, path, device, inode))
+    candidates, size_of = [], {}
+    for size, group in by_size.items():
+        if len(group) < 2:
+            continue
+        # Hard links share their content, they are one file
+        seen, unique = set(), []
+        for folder_index, path, device, inode in group:
+            if not inode:
+                # DirEntry.stat() has no inode number on Windows, os.stat() has
+                try:
+                    info = os.stat(path)
+                except OSError:
+                    continue
+                device, inode = info.st_dev, info.st_ino
+            if inode:
+                if (device, inode) in seen:
+                    continue
+                seen.add((device, inode))
+            unique.append((folder_index, path))
+            size_of[path] = size
+        if len(unique) > 1:
+            candidates.append(unique)
+    if not candidates:
+        return []
+
+    folder_of = {path: folder_index for group in candidates for folder_index, path in group}
+    with ProcessPoolExecutor(max_workers=threads) as executor:
+        groups = group_by_hash([[path for _, path in group] for group in candidates], edge_hash, executor)
+        # Files not longer than both edges were already hashed whole
+        small = [group for group in groups if size_of[group[0]] <= 2 * HASH_EDGE]
+        large = [group for group in groups if size_of[group[0]] > 2 * HASH_EDGE]
+        groups = small + group_by_hash(large, content_hash, executor)
+    return [[(folder_of[path], path, size_of[path]) for path in group] for group in groups]
+
+# Returns list of folders sorted by size of duplicate files they hold (descending)
+def list_duplicate_sizes(flags):
+    print("\nParsing folder...", end='\r')
+
+    root_folder, unit_abbreviation, unit_divider, exclude_regex, size_threshold, threads, top = flags[:7]
+    exclude_pattern = make_matcher(exclude_regex)
+    files = []
+    names, parents, sizes = scan_folder_tree(root_folder, exclude_pattern, files)
+    del sizes
+    print(f"{len(files)} files found.        \n")
+
+    print("Comparing files...", end='\r')
+    groups = find_duplicates(files, threads if threads > 1 else None)
+    del files
+
+    # In every group the copy found first is kept, others could be removed
+    reclaimable = [0] * len(names)
+    for group in groups:
+        group.sort()
+        for folder_index, _, size in group[1:]:
+            reclaimable[folder_index] += size
+    totals = total_sizes(parents, reclaimable)
+    print(f"{len(groups)} groups of identical files, {(totals[0]*8)//unit_divider} {unit_abbreviation} reclaimable.\n")
+
+    filtered_folders = (index for index in range(len(totals)) if totals[index] and totals[index] >= size_threshold)
+    if top:
+        selected = heapq.nlargest(top, filtered_folders, key=totals.__getitem__)
+    else:
+        selected = sorted(filtered_folders, key=totals.__getitem__, reverse=True)
+    return [f"{(totals[index]*8)//unit_divider} {unit_abbreviation}:\t{folder_path(names, parents, index)}" for index in selected]
+
+# Watch mode keeps the tree in memory and follows it with Linux inotify, each event changes
+# totals of the folders on the path to the root only, so redraws do not depend on the tree size
+IN_MODIFY      = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM  = 0x00000040
+IN_MOVED_TO    = 0x00000080
+IN_CREATE      = 0x00000100
+IN_DELETE      = 0x00000200
+IN_Q_OVERFLOW  = 0x00004000
+IN_ONLYDIR     = 0x01000000
+IN_ISDIR       = 0x40000000
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_ONLYDIR
+WATCH_INTERVAL = 1.0  # Seconds between redraws of the table
+EVENT_HEADER = struct.Struct('iIII')  # wd, mask, cookie, length of name
+
+class Inotify:
+    '''Minimal binding of Linux inotify through ctypes'''
+    def __init__(self):
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.failures = 0  # Folders that could not be watched since the last full scan
+        self.warned = False
+        self.fd = self._libc.inotify_init1(os.O_CLOEXEC)
+        if self.fd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error))
+
+    def add_watch(self, path, mask=WATCH_MASK):
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error), path)
+        return wd
+
+    def rm_watch(self, wd):
+        self._libc.inotify_rm_watch(self.fd, wd)  # Fails only if the kernel already dropped the watch
+
+    def read(self, timeout):
+        '''Returns list of (wd, mask, name) events, waits at most timeout seconds (None: forever) for them'''
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return []
+        data = os.read(self.fd, 1 << 16)
+        events, offset = [], 0
+        while offset < len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            events.append((wd, mask, os.fsdecode(data[offset:offset + length].rstrip(b'\0'))))
+            offset += length
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+class WatchedFolder:
+    '''Folder of the watched tree, keeps sizes of its files so every change becomes a size delta'''
+    __slots__ = ('path', 'parent', 'files', 'subfolders', 'total', 'wd')
+
+    def __init__(self, path, parent):
+        self.path = path
+        self.parent = parent
+        self.files = {}       # name -> size of files directly inside
+        self.subfolders = {}  # name -> WatchedFolder
+        self.total = 0        # size of the whole subtree
+        self.wd = -1
+
+    def add(self, delta):
+        '''Adds delta to totals of this folder and all its ancestors'''
+        folder = self
+        while folder is not None:
+            folder.total += delta
+            folder = folder.parent
+
+def watch_tree(path, parent, exclude_pattern, inotify, watched):
+    '''Scans folder at path with its subfolders and watches each of them, totals are not added to parent'''
+    top = WatchedFolder(path, parent)
+    order, stack = [], [top]
+    while stack:
+        folder = stack.pop()
+        order.append(folder)
+        # Watch before listing, so entries created meanwhile are reported by an event
+        try:
+            folder.wd = inotify.add_watch(folder.path)
+            watched[folder.wd] = folder
+        except OSError as error:
+            # Folder can not be accessed or watch limit reached, its size stays static (a vanished one is reported by its parent)
+            if error.errno != errno.ENOENT:
+                inotify.failures += 1
+                if not inotify.warned:
+                    inotify.warned = True
+                    hint = " (raise fs.inotify.max_user_watches)" if error.errno == errno.ENOSPC else ""
+                    print(f"Warning: {folder.path} can not be watched: {error.strerror}{hint}, sizes of folders that are not watched stay static.",
+                          file=sys.stderr)
+        try:
+            dirs, entries = scan_entries(folder.path, exclude=exclude_pattern)
+        except OSError:
+            continue
+        for entry in dirs:
+            subfolder = WatchedFolder(entry.path, folder)
+            folder.subfolders[entry.name] = subfolder
+            stack.append(subfolder)
+        for entry in entries:
+            try:
+                folder.files[entry.name] = entry.stat().st_size
+            except OSError:
+                continue
+
+    # Children are placed after their parents
+    for folder in reversed(order):
+        folder.total += sum(folder.files.values())
+        if folder is not top:
+            folder.parent.total += folder.total
+    return top
+
+def unwatch_tree(top, inotify, watched):
+    '''Removes watches of folder top and all its subfolders'''
+    stack = [top]
+    while stack:
+        folder = stack.pop()
+        if watched.get(folder.wd) is folder:
+            del watched[folder.wd]
+            inotify.rm_watch(folder.wd)
+        stack.extend(folder.subfolders.values())
+
+def apply_events(events, exclude_pattern, inotify, watched):
+    '''Updates the watched tree by inotify events, returns False if the kernel dropped events'''
+    changed_files = {}  # Files are stat-ed once per batch, no matter how many writes were reported
+    for wd, mask, name in events:
+        if mask & IN_Q_OVERFLOW:
+            return False
+        folder = watched.get(wd)
+        # Events without a name concern the watched folder itself, its parent reports them too
+        if folder is None or not name or (exclude_pattern and exclude_pattern.search(name)):
+            continue
+
+        if mask & IN_ISDIR:
+            subfolder = folder.subfolders.pop(name, None)
+            if subfolder is not None:
+                unwatch_tree(subfolder, inotify, watched)
+                folder.add(-subfolder.total)
+            if mask & (IN_CREATE | IN_MOVED_TO):
+                # Moved folders are scanned again, the moved subtree is the size of the change
+                subfolder = watch_tree(os.path.join(folder.path, name), folder, exclude_pattern, inotify, watched)
+                folder.subfolders[name] = subfolder
+                folder.add(subfolder.total)
+        else:
+            changed_files[(folder, name)] = None
+
+    for folder, name in changed_files:
+        if watched.get(folder.wd) is not folder:
+            continue  # Folder was removed or moved by a later event
+        try:
+            info = os.stat(os.path.join(folder.path, name))
+            size = info.st_size if stat.S_ISREG(info.st_mode) else None
+        except OSError:
+            size = None
+        old_size = folder.files.pop(name, 0)
+        if size is not None:
+            folder.files[name] = size
+        folder.add((size or 0) - old_size)
+    return True
+
+def largest_watched(top, count, size_threshold):
+    '''Returns count largest folders, none is larger than its parent so the search goes down from the root'''
+    largest, tie = [], 0
+    heap = [(-top.total, tie, top)]
+    while heap and len(largest) < count:
+        total, _, folder = heapq.heappop(heap)
+        if -total < size_threshold:
+            break
+        largest.append(folder)
+        for subfolder in folder.subfolders.values():
+            tie += 1
+            heapq.heappush(heap, (-subfolder.total, tie, subfolder))
+    return largest
+
+# Shows the largest folders and keeps them current until interrupted
+def watch_folder_sizes(flags):
+    root_folder, unit_abbreviation, unit_divider, exclude_regex, size_threshold, _, top = flags[:7]
+    if not sys.platform.startswith('linux'):
+        sys.exit("Watch mode needs Linux inotify.")
+    exclude_pattern = make_matcher(exclude_regex)
+
+    print("\nParsing folder...", end='\r')
+    inotify = Inotify()
+    watched = {}
+    root = watch_tree(root_folder, None, exclude_pattern, inotify, watched)
+    dirty, next_draw = True, 0.0
+    try:
+        while True:
+            now = time.monotonic()
+            if dirty and now >= next_draw:
+                columns, rows = shutil.get_terminal_size()  # Not cached, the terminal may be resized while watching
+                table = [f"{(folder.total*8)//unit_divider} {unit_abbreviation}:\t{folder.path}"[:columns-10]
+                         for folder in largest_watched(root, top or max(rows - 4, 1), size_threshold)]
+                unwatched = f", {inotify.failures} folders not watched" if inotify.failures else ""
+                print("\033[H\033[J<------------ ", root_folder, f" content sorted by size (watching{unwatched}, Ctrl+C to stop) ------------>\n")
+                print('\n'.join(table), flush=True)
+                dirty, next_draw = False, now + WATCH_INTERVAL
+
+            # Redraw at most once per interval, events arriving meanwhile are applied as they come
+            events = inotify.read(max(next_draw - now, 0) if dirty else None)
+            if not events:
+                continue
+            dirty = True
+            if not apply_events(events, exclude_pattern, inotify, watched):
+                # Kernel queue overflowed and events were lost -> scan again
+                unwatch_tree(root, inotify, watched)
+                inotify.failures = 0
+                root = watch_tree(root_folder, None, exclude_pattern, inotify, watched)
+    except KeyboardInterrupt:
+        print()
+    finally:
+        inotify.close()
 
 # Execute
-flags = process_flags(sys.argv)
-list = list_folder_sizes(flags)
-rows, col = get_terminal_size_windows()
-if col: list = [l[:col-10] for l in list]
+if __name__ == "__main__":
+    flags = process_flags(sys.argv)
+    if flags[8]:
+        watch_folder_sizes(flags)
+        sys.exit()
+    if flags[10]:
+        export_folder_sizes(flags)
+        sys.exit()
+    if flags[9]:
+        table = list_duplicate_sizes(flags)
+        title = " reclaimable space in duplicates"
+    else:
+        table = list_folder_sizes(flags)
+        title = " content sorted by size"
+    rows, col = get_terminal_size()
+    table = (l[:col-10] for l in table)
 
-print("\n<------------ ", flags[0], " content sorted by size ------------>\n\n")
-for l in list: print(l)
+    print("\n<------------ ", flags[0], title, "------------>\n\n")
+    if flags[12]: paginate(table)
+    else:
+        for l in table: print(l)
 
-sys.exit()
+    sys.exit()